@@ -1,30 +1,132 @@
 import os
 import json
-import shutil
+import hashlib
+import itertools
 import threading
 import time
 import pytz
 import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, render_template, request, jsonify, Response
 from flask_apscheduler import APScheduler
-from run_model import run_lesnet_inference
+from werkzeug.middleware.proxy_fix import ProxyFix
+from result_cache import ResultCache, MANIFEST_NAME
+from catalog import Catalog, LAKE_NAMES
+from tiles import TileCache
+from value_store import ValueStore
+from metrics import verification_metrics, METRIC_THRESHOLDS
+from util import METADATA_INDEX_NAME
+from splits_index import split_index
+from job_store import SQLiteJobStore, process_owner, PRIORITY_CLASSES
+from expiry import ExpiryScheduler
+from static_delivery import send_static, precompress_dir, SENDFILE_MODE, IMMUTABLE_CACHE_CONTROL
+from run_model import (prepare_input, infer_to_netcdf, render_outputs, init_worker_process, model_registry,
+                       model_version, x86_client, worker_process_state, run_in_worker)
 
 app = Flask(__name__)
+# Let Apache/lighttpd send files when configured; see static_delivery
+app.config['USE_X_SENDFILE'] = SENDFILE_MODE == 'x-sendfile'
+# Reverse proxies in front of the app; their X-Forwarded-For gives the client address used for fair queuing
+PROXY_HOPS = int(os.environ.get('LESWEB_PROXY_HOPS', 0))
+if PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_HOPS)
 scheduler = APScheduler()
 
-# Create a queue for model runs
-model_queue = queue.Queue()
-# Dictionary to track model run status
-model_status = {}
-# Lock for thread-safe access to model_status
+# Completed output folders listed by /get_available_data
+catalog = Catalog(os.path.join(os.path.dirname(__file__), 'data'))
+# Status TTLs, stale-run reaping and output retention, all on one timer thread
+expiry = ExpiryScheduler()
+# Seconds a finished run's status stays queryable
+STATUS_TTL_SECONDS = 3600
+# Seconds between sweeps for old runs whose TTL was lost to a restart
+STALE_RUN_SWEEP_SECONDS = 3600
+# Seconds between checks for runs claimed by web workers that have died
+ORPHAN_CHECK_SECONDS = 60
+
+
+def on_result_published(fname):
+    catalog.add(fname)
+    schedule_retention(fname)
+
+
+# Rendered outputs, reused across requests until evicted
+result_cache = ResultCache(os.path.join(os.path.dirname(__file__), 'data'),
+                           on_publish=on_result_published, on_remove=catalog.remove)
+# XYZ map tiles rendered on demand from each folder's out.nc
+tile_cache = TileCache(os.path.join(os.path.dirname(__file__), 'data'))
+# Memory-mapped value grids for cursor readout and region queries
+value_store = ValueStore(os.path.join(os.path.dirname(__file__), 'data'))
+
+# Queue, status and results of model runs, shared by all web worker processes
+job_store = SQLiteJobStore()
+# Names this process as the owner of the runs it claims
+WORKER_OWNER = process_owner()
+# Lock pairing with status_changed
 status_lock = threading.Lock()
-# Maximum number of concurrent model runs
-MAX_CONCURRENT_RUNS = 1
-# Counter for active runs
-active_runs = 0
-# Unique ID counter for model runs
-next_run_id = 0
+# Notified whenever this process changes a run or queues one; holders only wait or notify
+status_changed = threading.Condition(status_lock)
+# Bumped with every status_changed notification, so waiters cannot miss one
+status_generation = 0
+# Notified when this process queues a run, to wake an idle download worker
+run_queued = threading.Condition()
+# Longest wait before re-reading the store, to see changes made by other processes
+JOB_STORE_POLL_SECONDS = 1
+# Seconds between keep-alive comments on an idle status stream
+STATUS_STREAM_HEARTBEAT_SECONDS = 15
+# Longest a long-poll status request is held open
+STATUS_LONG_POLL_MAX_SECONDS = 30
+# Status requests per process that may be held open waiting for a change
+STATUS_MAX_WAITERS = int(os.environ.get('LESWEB_STATUS_MAX_WAITERS', 8))
+# Seconds between plain polls for clients that are not held open
+STATUS_POLL_INTERVAL_SECONDS = 5
+# Free slots for held status requests
+status_waiters = threading.BoundedSemaphore(STATUS_MAX_WAITERS)
+# Maximum number of concurrent model runs (inference stage workers)
+MAX_CONCURRENT_RUNS = int(os.environ.get('LESWEB_WORKERS', 1))
+# Worker threads for the network-bound download stage
+DOWNLOAD_WORKERS = int(os.environ.get('LESWEB_DOWNLOAD_WORKERS', 2))
+# Worker threads for the rendering stage
+RENDER_WORKERS = int(os.environ.get('LESWEB_RENDER_WORKERS', 1))
+# 'thread' runs jobs in the web process, 'process' in pools of worker processes
+WORKER_MODE = os.environ.get('LESWEB_WORKER_MODE', 'thread')
+# Split the cores between inference processes so they do not oversubscribe
+TORCH_THREADS_PER_WORKER = max(1, (os.cpu_count() or 1) // MAX_CONCURRENT_RUNS)
+# Worker process pools per stage, used when WORKER_MODE is 'process'
+process_pools = {}
+process_pool_lock = threading.Lock()
+# Last reported state of each pool worker process, by stage and pid
+process_worker_states = {}
+# Pool workers re-import this module under spawn and must not start background services
+IS_WORKER_PROCESS = multiprocessing.parent_process() is not None
+# Largest number of same-lake jobs pushed through the models as one batch
+BATCH_MAX_SIZE = 4
+# Seconds a worker waits for more same-lake jobs before running a batch
+BATCH_WAIT_SECONDS = 0.5
+# Load all LESNet models into the registry when workers start
+WARM_UP_MODELS = os.environ.get('LESWEB_WARM_UP', '1') == '1'
+# Precompute curated split dates while the queue is idle
+PRECOMPUTE_ENABLED = os.environ.get('LESWEB_PRECOMPUTE', '1') == '1'
+# Splits to precompute, in order; these are the dates the picker highlights
+PRECOMPUTE_SPLITS = ('test', 'val')
+# Valid hours (UTC) to precompute for each date; 23 is the picker's default time
+PRECOMPUTE_HOURS = [int(h) for h in os.environ.get('LESWEB_PRECOMPUTE_HOURS', '23').split(',')]
+# Seconds between checks for idle capacity
+PRECOMPUTE_INTERVAL_SECONDS = 15
+# Precompute runs allowed in the queue or pipeline at once
+PRECOMPUTE_MAX_ACTIVE = 1
+# Client key of precompute runs, so fair queuing treats them as one client
+PRECOMPUTE_CLIENT = 'precompute'
+# Precompute runs in the one process holding this job store lease, renewed every interval
+PRECOMPUTE_LEASE = 'precompute'
+PRECOMPUTE_LEASE_SECONDS = 4 * PRECOMPUTE_INTERVAL_SECONDS
+# Runs submitted by this process, and what the last pass found cached, missing or failed
+precompute_stats = {'submitted': 0, 'cached': 0, 'missing': 0, 'failed': 0}
+# Bounded hand-off queues between pipeline stages, so downloads cannot run far ahead
+inference_queue = queue.Queue(maxsize=BATCH_MAX_SIZE * MAX_CONCURRENT_RUNS)
+render_queue = queue.Queue(maxsize=2 * RENDER_WORKERS)
 
 @app.route('/')
 def index():
@@ -38,164 +140,342 @@ def index():
     ]
     return render_template('index.html', lakes=lakes)
 
-def process_model_queue():
-    """Worker thread that processes the model queue"""
-    global active_runs
-    print(f"Worker thread starting at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+def run_status_payload(run_id):
+    """Status reported to clients for a run, or None if unknown."""
+    status_data = job_store.get(run_id)
+    if status_data is None:
+        return None
+
+    # If run is completed, include the result data
+    if status_data['status'] in ['completed', 'error']:
+        payload = {
+            "run_id": run_id,
+            "status": status_data['status'],
+            "result": status_data.get('result', {})
+        }
+    else:
+        payload = {
+            "run_id": run_id,
+            "status": status_data['status'],
+            "stage": status_data.get('stage'),
+            "queue_position": status_data['queue_position'],
+            # Runs downloading or waiting between stages do not hold a model slot;
+            # each of the max_runs workers runs up to batch_size same-lake runs together
+            "active_runs": job_store.stage_counts().get('inference', 0),
+            "max_runs": MAX_CONCURRENT_RUNS,
+            "batch_size": BATCH_MAX_SIZE
+        }
+    payload["etag"] = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+    return payload
+
+
+def notify_status_changed():
+    """Wake status requests waiting in this process after a run changed."""
+    global status_generation
+    with status_lock:
+        status_generation += 1
+        status_changed.notify_all()
+
+
+def hold_status_request():
+    """Take a slot for a status request to wait for changes; False if it must answer at once.
+
+    Sync WSGI workers serve one request at a time, so a held status request
+    would block every other route; only threaded or async workers hold them,
+    and at most STATUS_MAX_WAITERS at once. Release the slot with
+    status_waiters.release().
+    """
+    if not request.environ.get('wsgi.multithread'):
+        return False
+    return status_waiters.acquire(blocking=False)
+
+
+def wait_for_status_change(run_id, since, timeout):
+    """Block until the run's payload differs from the etag since, or timeout.
+
+    Waiters wake only on status_changed; changes made by other processes
+    are seen when the wait times out and the payload is read again.
+    """
+    deadline = time.time() + timeout
+    with status_lock:
+        generation = status_generation
+    payload = run_status_payload(run_id)
+    while payload is not None and payload['etag'] == since and payload['status'] not in ['completed', 'error']:
+        with status_lock:
+            while generation == status_generation:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                status_changed.wait(remaining)
+            generation = status_generation
+        payload = run_status_payload(run_id)
+        if time.time() >= deadline:
+            break
+    return payload
+
+
+def set_run_status(run_ids, status, result=None):
+    """Record the final status (and result) of one or more runs."""
+    # Finished runs no longer match new submissions in submit()
+    updated = job_store.finish(run_ids, status, result)
+    if updated < len(run_ids):
+        print(f"Warning: Some of runs {run_ids} not found in job store")
+    notify_status_changed()
+
+
+def schedule_status_cleanup(run_id):
+    """Drop a finished run's status entry after STATUS_TTL_SECONDS."""
+    # Only removed if it is still in a terminal state
+    expiry.schedule(('status', run_id), STATUS_TTL_SECONDS, lambda: job_store.delete_finished(run_id))
+
+
+def schedule_retention(fname):
+    """Remove a result cache entry once it has gone unrequested for the cache's maximum age."""
+    def expire():
+        # Lookups refresh the entry's access time, so check again before removing
+        expires_at = result_cache.expire_entry(fname)
+        if expires_at is not None:
+            expiry.schedule(('output', fname), expires_at - time.time(), expire)
+
+    expires_at = result_cache.expire_entry(fname)
+    if expires_at is not None:
+        expiry.schedule(('output', fname), expires_at - time.time(), expire)
+
+
+def reap_stale_runs():
+    """Remove old runs from the job store, including those whose TTL was lost to a restart"""
+    now = time.time()
+    # Finished runs are kept for a day, anything else for at most 3 days
+    removed = job_store.expire(finished_before=now - 24 * 3600, submitted_before=now - 72 * 3600)
+    if removed:
+        print(f"Cleaned up {removed} stale model status entries")
+
+
+def requeue_orphaned_runs():
+    """Put runs claimed by web workers that have since died back in the queue."""
+    requeued = job_store.requeue_orphans(WORKER_OWNER)
+    if requeued:
+        print(f"Requeued {requeued} interrupted runs")
+        with run_queued:
+            run_queued.notify_all()
+
+
+def completed_result(fname):
+    """Result payload reported for a finished run."""
+    return {
+        'success': True,
+        'data_path': f"data/{fname}/",
+        'folder_name': fname
+    }
+
+
+def set_run_stage(job, stage):
+    """Record which pipeline stage a job's runs are in."""
+    job_store.set_stage(job['run_ids'], stage)
+    notify_status_changed()
+
+
+def finish_job(job, status, result):
+    """Report a job's outcome to all of its runs and take it out of the pipeline."""
+    if status != 'completed' and job.get('staging'):
+        result_cache.discard(job['staging'])
+    set_run_status(job['run_ids'], status, result)
+    for run_id in job['run_ids']:
+        schedule_status_cleanup(run_id)
+
+
+def fail_job(job, error):
+    print(f"Error in run {job['run_ids']}: {error}")
+    finish_job(job, 'error', {'success': False, 'error': str(error)})
+
+
+def collect_batch(job_queue, first_job):
+    """Gather queued jobs for the same lake as first_job into one batch.
+
+    Waits up to BATCH_WAIT_SECONDS for more jobs, stopping early once
+    BATCH_MAX_SIZE is reached. Jobs for other lakes keep their place in
+    the queue.
+    """
+    batch = [first_job]
+    lake = first_job['lake']
+    deadline = time.time() + BATCH_WAIT_SECONDS
+    while len(batch) < BATCH_MAX_SIZE:
+        with job_queue.mutex:
+            for job in list(job_queue.queue):
+                if len(batch) >= BATCH_MAX_SIZE:
+                    break
+                if job['lake'] == lake:
+                    job_queue.queue.remove(job)
+                    batch.append(job)
+            # Let producers blocked on a full queue continue
+            job_queue.not_full.notify_all()
+        if len(batch) >= BATCH_MAX_SIZE or time.time() >= deadline:
+            break
+        time.sleep(0.05)
+    return batch
+
+
+def get_process_pool(stage):
+    """Return the worker process pool for a pipeline stage, creating it on first use."""
+    with process_pool_lock:
+        pool = process_pools.get(stage)
+        if pool is None:
+            if stage == 'inference':
+                workers, threads, warm_up = MAX_CONCURRENT_RUNS, TORCH_THREADS_PER_WORKER, WARM_UP_MODELS
+            else:
+                workers, threads, warm_up = RENDER_WORKERS, 1, False
+            print(f"Starting {workers} {stage} worker processes with {threads} torch threads each")
+            started = time.time()
+            context = multiprocessing.get_context('spawn')
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=init_worker_process,
+                initargs=(threads, warm_up, context.Barrier(workers))
+            )
+            # Workers spawn on demand; one task each starts them all now, so the
+            # initializer and model warm-up are not paid by the first job
+            futures = [pool.submit(worker_process_state, True) for _ in range(workers)]
+            states = [future.result() for future in futures]
+            process_worker_states[stage] = {state['pid']: state for state in states}
+            print(f"{len(process_worker_states[stage])} {stage} worker processes ready "
+                  f"in {time.time() - started:.2f} seconds")
+            process_pools[stage] = pool
+        return pool
+
+
+def model_registry_status():
+    """Model registry counters of this process, or of each inference worker process in process mode."""
+    if WORKER_MODE != 'process':
+        return model_registry.stats()
+    with process_pool_lock:
+        states = process_worker_states.get('inference', {})
+        return {'workers': {str(pid): state['models'] for pid, state in states.items()}}
+
+
+def run_stage(stage, func, *args):
+    """Run a stage function in this thread or in the stage's worker processes."""
+    if WORKER_MODE != 'process':
+        return func(*args)
+
+    pool = get_process_pool(stage)
+    try:
+        result, state = pool.submit(run_in_worker, func, *args).result()
+    except BrokenProcessPool:
+        # A worker process died; the next job gets a fresh pool
+        print(f"{stage} worker process died, restarting pool")
+        with process_pool_lock:
+            if process_pools.get(stage) is pool:
+                del process_pools[stage]
+                process_worker_states.pop(stage, None)
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    with process_pool_lock:
+        if process_pools.get(stage) is pool:
+            process_worker_states[stage][state['pid']] = state
+    return result
+
+
+def claim_run():
+    """Wait for a queued run and claim it for this process."""
+    while True:
+        run = job_store.claim_next(WORKER_OWNER)
+        if run is not None:
+            # Runs behind it moved up the queue
+            notify_status_changed()
+            return run
+        # Runs queued by other processes are picked up on the next poll
+        with run_queued:
+            run_queued.wait(JOB_STORE_POLL_SECONDS)
+
+
+def download_worker():
+    """Pipeline stage 1: claim queued runs from the job store and fetch their inputs."""
+    print(f"Download worker starting at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    while True:
+        run = claim_run()
+        run_id, lake, date_str = run['run_id'], run['lake'], run['date']
+        job = {'run_ids': [run_id], 'lake': lake, 'staging': None}
+        try:
+            # Format date string to ISO format required by the model
+            date_obj = datetime.strptime(date_str, '%Y-%m-%d %H:00')
+            job['iso_date'] = date_obj.strftime('%Y-%m-%dT%H:%M:00Z')
+            # Generate the folder name for output
+            job['fname'] = date_obj.strftime('%Y%m%d_%H') + lake[0]
+            job['version'] = model_version(lake)
+
+            # Published while this job waited in the queue
+            if result_cache.lookup(job['fname'], job['version']):
+                finish_job(job, 'completed', completed_result(job['fname']))
+                continue
+
+            print(f"Downloading inputs for run {run_id} ({lake} at {date_str})")
+            job['staging'] = result_cache.staging_dir(job['fname'])
+            prepare_input(job['iso_date'], lake, out_dir=job['staging'])
+
+            set_run_stage(job, 'waiting for inference')
+            inference_queue.put(job)
+        except Exception as e:
+            fail_job(job, e)
+
+
+def inference_worker():
+    """Pipeline stage 2: run batched inference for downloaded same-lake jobs."""
+    print(f"Inference worker starting at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     while True:
-        run_id = None
+        batch = collect_batch(inference_queue, inference_queue.get())
+        lake = batch[0]['lake']
         try:
-            # Get next item from queue (blocking call)
-            run_id, lake, date_str = model_queue.get()
-            print(f"Processing run {run_id} for {lake} at {date_str}")
-
-            # Mark as processing
-            with status_lock:
-                if run_id in model_status:
-                    active_runs += 1
-                    model_status[run_id]['status'] = 'processing'
+            for job in batch:
+                set_run_stage(job, 'inference')
+            print(f"Running inference for runs {[job['run_ids'] for job in batch]} on {lake}")
+
+            run_started = time.time()
+            errors = run_stage('inference', infer_to_netcdf, lake,
+                               [(job['fname'], job['staging']) for job in batch], "cpu")
+            print(f"Inference for {lake} completed in {time.time() - run_started:.2f} seconds")
+
+            for job, error in zip(batch, errors):
+                if error:
+                    fail_job(job, error)
                 else:
-                    # This shouldn't happen, but just in case
-                    print(f"Warning: Run {run_id} not found in status dict")
-                    model_status[run_id] = {
-                        'status': 'processing',
-                        'submitted_at': datetime.now().isoformat(),
-                        'lake': lake,
-                        'date': date_str,
-                        'queue_position': 0,
-                        'result': None
-                    }
-                    active_runs += 1
-
-            try:
-                # Format date string to ISO format required by the model
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d %H:00')
-                iso_date = date_obj.strftime('%Y-%m-%dT%H:%M:00Z')
-
-                # Generate the folder name for output
-                fname = date_obj.strftime('%Y%m%d_%H') + lake[0]
-
-                # Check for existing folder with the same name
-                output_path = os.path.join(os.path.dirname(__file__), 'data', fname)
-                if os.path.exists(output_path):
-                    # Don't delete immediately - check how old it is
-                    try:
-                        creation_time = os.path.getctime(output_path)
-                        age_minutes = (time.time() - creation_time) / 60
-
-                        # Only remove if older than 30 minutes to avoid conflicts with active views
-                        if age_minutes > 30:
-                            print(f"Removing old output directory: {output_path} ({age_minutes:.1f} minutes old)")
-                            try:
-                                shutil.rmtree(output_path)
-                            except Exception as e:
-                                print(f"Error removing directory {output_path}: {e}")
-                        else:
-                            print(f"Found recent output directory: {output_path} ({age_minutes:.1f} minutes old)")
-                            # Use a unique folder name instead
-                            unique_id = int(time.time()) % 10000
-                            fname = f"{fname}_{unique_id}"
-                            output_path = os.path.join(os.path.dirname(__file__), 'data', fname)
-                            print(f"Using alternative output path: {output_path}")
-                    except Exception as e:
-                        print(f"Error checking directory age {output_path}: {e}")
-
-                # Run the model with timeout protection
-                run_started = time.time()
-                print(f"Starting model inference for {run_id}")
-
-                run_lesnet_inference(
-                    get_time=iso_date,
-                    lake=lake,
-                    device="cpu"
-                )
-
-                run_duration = time.time() - run_started
-                print(f"Model inference completed for {run_id} in {run_duration:.2f} seconds")
-
-                # Update status with success
-                with status_lock:
-                    if run_id in model_status:
-                        model_status[run_id]['status'] = 'completed'
-                        model_status[run_id]['result'] = {
-                            'success': True,
-                            'data_path': f"data/{fname}/",
-                            'folder_name': fname
-                        }
-                    else:
-                        print(f"Warning: Run {run_id} not found in status dict after completion")
-            except ValueError as e:
-                print(f"ValueError in model run {run_id}: {e}")
-                with status_lock:
-                    if run_id in model_status:
-                        model_status[run_id]['status'] = 'error'
-                        model_status[run_id]['result'] = {
-                            'success': False,
-                            'error': str(e)
-                        }
-            except Exception as e:
-                error_msg = str(e)
-                print(f"Exception in model run {run_id}: {error_msg}")
-
-                with status_lock:
-                    if run_id in model_status:
-                        model_status[run_id]['status'] = 'error'
-                        model_status[run_id]['result'] = {
-                            'success': False,
-                            'error': error_msg
-                        }
-            finally:
-                # Always decrement the active runs counter
-                with status_lock:
-                    active_runs = max(0, active_runs - 1)  # Ensure it never goes negative
-
-                # Mark task as done
-                model_queue.task_done()
-
-                # Clean up status after some time for completed/error runs to prevent memory leaks
-                if run_id and model_status.get(run_id, {}).get('status') in ['completed', 'error']:
-                    def cleanup_status(run_id_to_clean):
-                        time.sleep(3600)  # Keep status for an hour
-                        with status_lock:
-                            if run_id_to_clean in model_status:
-                                # Check if it's still in a terminal state before removing
-                                if model_status[run_id_to_clean].get('status') in ['completed', 'error']:
-                                    del model_status[run_id_to_clean]
-                                    print(f"Cleaned up status for {run_id_to_clean}")
-                                else:
-                                    print(f"Skipped cleanup for {run_id_to_clean} - status changed")
-
-                    cleanup_thread = threading.Thread(
-                        target=cleanup_status,
-                        args=(run_id,),
-                        daemon=True
-                    )
-                    cleanup_thread.start()
+                    set_run_stage(job, 'waiting for render')
+                    render_queue.put(job)
         except Exception as e:
-            print(f"Critical error in queue worker: {e}")
-            # If we have a run_id, mark it as failed
-            if run_id:
-                with status_lock:
-                    if run_id in model_status:
-                        model_status[run_id]['status'] = 'error'
-                        model_status[run_id]['result'] = {
-                            'success': False,
-                            'error': f"Internal server error: {str(e)}"
-                        }
-                        active_runs = max(0, active_runs - 1)
-                model_queue.task_done()
-
-            # Sleep briefly to avoid busy-waiting in case of persistent errors
-            time.sleep(1)
+            for job in batch:
+                fail_job(job, f"Internal server error: {str(e)}")
+        finally:
+            for _ in batch:
+                inference_queue.task_done()
+
+
+def render_worker():
+    """Pipeline stage 3: render map products and publish the finished result."""
+    print(f"Render worker starting at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    while True:
+        job = render_queue.get()
+        try:
+            set_run_stage(job, 'rendering')
+            metrics = run_stage('render', render_outputs, job['fname'], job['staging'])
+            result_cache.publish(job['fname'], job['staging'], job['lake'], job['iso_date'], job['version'],
+                                 extra={'metrics': metrics})
+            finish_job(job, 'completed', completed_result(job['fname']))
+        except Exception as e:
+            fail_job(job, e)
+        finally:
+            render_queue.task_done()
+
 
 @app.route('/run_model', methods=['POST'])
 def run_model():
     """Queue a model run and return a run ID for status checking."""
-    global next_run_id
-
     data = request.json or {}
     lake = data.get('lake', 'erie').lower()
     date_str = data.get('date', '')
+    # Clients may ask for less urgent scheduling, e.g. for scripted backfills
+    priority = data.get('priority', 'interactive')
+    # Runs are shared out fairly between client addresses
+    client = request.remote_addr
 
     try:
         # Validate inputs
@@ -204,6 +484,11 @@ def run_model():
                 "success": False,
                 "error": "Missing required parameters"
             }), 400
+        if priority not in PRIORITY_CLASSES:
+            return jsonify({
+                "success": False,
+                "error": f"Unknown priority '{priority}', expected one of {', '.join(PRIORITY_CLASSES)}"
+            }), 400
 
         # Format date string to check format
         date_obj = datetime.strptime(date_str, '%Y-%m-%d %H:00')
@@ -212,46 +497,48 @@ def run_model():
         fname = date_obj.strftime('%Y%m%d_%H') + lake[0]
 
         # Check if date/lake combination is in the missing list
-        try:
-            with open("./splits/missing.txt", "r") as f:
-                missing_dates = [line.strip() for line in f.readlines()]
-
-            if fname in missing_dates:
-                return jsonify({
-                    "success": False,
-                    "error": f"The requested date ({date_str} UTC) has missing data for {lake} and cannot be processed."
-                }), 400
-        except FileNotFoundError:
-            # If missing.txt doesn't exist, continue without checking
-            pass
+        if split_index.is_missing(fname):
+            return jsonify({
+                "success": False,
+                "error": f"The requested date ({date_str} UTC) has missing data for {lake} and cannot be processed."
+            }), 400
 
-        # Get a unique ID for this run
-        with status_lock:
-            run_id = f"run_{next_run_id}"
-            next_run_id += 1
-
-            # Initialize status entry
-            position_in_queue = model_queue.qsize()
-            model_status[run_id] = {
-                'status': 'queued',
-                'submitted_at': datetime.now().isoformat(),
-                'lake': lake,
-                'date': date_str,
-                'queue_position': position_in_queue,
-                'result': None
-            }
-
-        # Add to queue
-        model_queue.put((run_id, lake, date_str))
-
-        return jsonify({
+        # Identical requests share one run
+        version = model_version(lake)
+        job_key = f"{lake}/{fname}/{version}"
+
+        # Serve a cached result straight from disk without queueing
+        if result_cache.lookup(fname, version):
+            result = completed_result(fname)
+            run_id, _ = job_store.submit(lake, date_str, job_key, result=result, priority=priority, client=client)
+            schedule_status_cleanup(run_id)
+            return jsonify({
+                "success": True,
+                "run_id": run_id,
+                "status": "completed",
+                "result": result
+            })
+
+        # Attaches to a queued or processing run for the same job if there is one
+        run_id, coalesced = job_store.submit(lake, date_str, job_key, priority=priority, client=client)
+        notify_status_changed()
+        if not coalesced:
+            with run_queued:
+                run_queued.notify()
+        payload = run_status_payload(run_id)
+
+        response = {
             "success": True,
             "run_id": run_id,
-            "status": "queued",
-            "queue_position": position_in_queue,
-            "active_runs": active_runs,
-            "max_runs": MAX_CONCURRENT_RUNS
-        })
+            "status": payload['status'],
+            "queue_position": payload.get('queue_position', 0),
+            "active_runs": payload.get('active_runs', 0),
+            "max_runs": MAX_CONCURRENT_RUNS,
+            "batch_size": BATCH_MAX_SIZE
+        }
+        if coalesced:
+            response["coalesced"] = True
+        return jsonify(response)
     except ValueError as e:
         return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
@@ -259,111 +546,272 @@ def run_model():
 
 @app.route('/data/<path:filename>')
 def serve_data(filename):
-    """Serve data files from the data directory."""
-    return send_from_directory('data', filename)
+    """Serve data files from the data directory.
+
+    URLs carrying ?v=<model version> of the folder's current result never
+    change content, so they are cached as immutable; others revalidate.
+    """
+    if filename.startswith('.'):
+        return jsonify({"error": "File not found"}), 404
+
+    folder = filename.split('/')[0]
+    cache_control = 'no-cache'
+    version = request.args.get('v')
+    if version:
+        manifest = result_cache.read_manifest(folder)
+        if manifest and manifest.get('version') == version:
+            cache_control = IMMUTABLE_CACHE_CONTROL
+    response = send_static(os.path.join(os.path.dirname(__file__), 'data'), filename, cache_control)
+    if response.status_code < 400 and '/' in filename:
+        result_cache.touch(folder)
+    return response
+
+@app.route('/tiles/<folder>/<var>/<int:z>/<int:x>/<int:y>.png')
+def serve_tile(folder, var, z, x, y):
+    """Serve one Web Mercator map tile, rendering it on first request.
+
+    As for /data, only URLs carrying the folder's current model version
+    are cached as immutable; others revalidate against the ETag.
+    """
+    if folder.startswith('.') or var.startswith('.'):
+        return jsonify({"error": "Tile not found"}), 404
+    try:
+        tile = tile_cache.get(folder, var, z, x, y)
+    except (FileNotFoundError, KeyError):
+        return jsonify({"error": "Tile not found"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    result_cache.touch(folder)
+    response = Response(tile.data, mimetype='image/png')
+    response.set_etag(tile.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    version = request.args.get('v')
+    if version:
+        manifest = result_cache.read_manifest(folder)
+        if manifest and manifest.get('version') == version:
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response.make_conditional(request)
+
+@app.route('/value/<folder>/<var>')
+def get_value(folder, var):
+    """Return the value of one variable at ?lat=&lon=."""
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    if lat is None or lon is None:
+        return jsonify({"error": "lat and lon are required"}), 400
+    if folder.startswith('.') or var.startswith('.'):
+        return jsonify({"error": "Variable not found"}), 404
+    try:
+        grid = value_store.grid(folder, var)
+    except FileNotFoundError:
+        return jsonify({"error": "Variable not found"}), 404
+    result_cache.touch(folder)
+    return jsonify({"variable": var, "lat": lat, "lon": lon, "value": grid.point(lat, lon)})
+
+@app.route('/value/<folder>/<var>/bbox')
+def get_value_bbox(folder, var):
+    """Summarize one variable over ?south=&west=&north=&east=."""
+    bounds = [request.args.get(key, type=float) for key in ('south', 'west', 'north', 'east')]
+    if None in bounds:
+        return jsonify({"error": "south, west, north and east are required"}), 400
+    if folder.startswith('.') or var.startswith('.'):
+        return jsonify({"error": "Variable not found"}), 404
+    try:
+        region = value_store.grid(folder, var).region(*bounds)
+    except FileNotFoundError:
+        return jsonify({"error": "Variable not found"}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    result_cache.touch(folder)
+    return jsonify({"variable": var, "bbox": bounds, "region": region})
+
+@app.route('/metrics/<folder>')
+def get_metrics(folder):
+    """Return verification scores of the forecasts in a folder against QPE_target."""
+    if folder.startswith('.'):
+        return jsonify({"error": "Folder not found"}), 404
+    data_dir = os.path.join(os.path.dirname(__file__), 'data', folder)
+    if not os.path.isdir(data_dir):
+        return jsonify({"error": "Folder not found"}), 404
+
+    # Scores are stored in the manifest at publish time; older folders or a
+    # changed threshold list are scored now
+    manifest = result_cache.read_manifest(folder) or {}
+    metrics = manifest.get('metrics')
+    if not metrics or metrics.get('thresholds') != [f"{t:g}" for t in METRIC_THRESHOLDS]:
+        try:
+            metrics = verification_metrics(data_dir)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+    if metrics is None:
+        return jsonify({"error": "No QPE_target in folder"}), 404
+    return jsonify(metrics)
 
 @app.route('/get_available_data')
 def get_available_data():
-    """Return a list of available model output folders."""
+    """Return available model output folders, optionally filtered by ?lake=&start=&end= and paged by ?offset=&limit=."""
     try:
-        data_dir = os.path.join(os.path.dirname(__file__), 'data')
-        if not os.path.exists(data_dir):
-            return jsonify({"folders": []})
-
-        folders = [d for d in os.listdir(data_dir)
-                  if os.path.isdir(os.path.join(data_dir, d))
-                  and os.path.exists(os.path.join(data_dir, d, 'out.nc'))]
-
-        # Format: YYYYMMDD_HHL (L = lake initial)
-        result = []
-        for folder in folders:
-            try:
-                if len(folder) == 12:  # Expected format length
-                    date_part = folder[:10]
-                    lake_initial = folder[10]
-
-                    # Map lake initial to full name
-                    lake_map = {'e': 'Erie', 'm': 'Michigan', 'o': 'Ontario', 's': 'Superior'}
-                    lake_name = lake_map.get(lake_initial, 'Unknown')
-
-                    # Parse date and ensure it's treated as UTC
-                    date_obj = datetime.strptime(date_part, '%Y%m%d_%H')
-                    formatted_date = date_obj.strftime('%Y-%m-%d %H:00')
-
-                    # Get folder creation time (ctime)
-                    folder_path = os.path.join(data_dir, folder)
-                    ctime = os.stat(folder_path).st_ctime
-                    result.append({
-                        "folder": folder,
-                        "date": formatted_date,
-                        "lake": lake_name,
-                        "ctime": ctime
-                    })
-            except Exception:
-                # Skip folders that don't match the expected format
-                continue
-
-        # Sort by ctime descending (most recent first)
-        result.sort(key=lambda x: x["ctime"], reverse=True)
-        return jsonify({"folders": result})
+        offset = request.args.get('offset', 0, type=int)
+        limit = request.args.get('limit', type=int)
+        if offset < 0 or (limit is not None and limit < 0):
+            return jsonify({"error": "offset and limit must not be negative"}), 400
+
+        etag = catalog.etag
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            total, folders = catalog.query(
+                lake=request.args.get('lake'),
+                start=request.args.get('start'),
+                end=request.args.get('end'),
+                offset=offset,
+                limit=limit
+            )
+            response = jsonify({"folders": folders, "total": total, "offset": offset, "limit": limit})
+        response.set_etag(etag)
+        # Revalidate on every load; unchanged catalogs answer 304
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/model_status/<run_id>', methods=['GET'])
 def get_model_status(run_id):
-    """Get the status of a model run by ID"""
-    with status_lock:
-        if run_id in model_status:
-            status_data = model_status[run_id].copy()
-
-            # If run is completed, include the result data
-            if status_data['status'] == 'completed' or status_data['status'] == 'error':
-                result = status_data.get('result', {})
-                return jsonify({
-                    "run_id": run_id,
-                    "status": status_data['status'],
-                    "result": result
-                })
-            else:
-                # For queued or processing runs, include position and counts
-                return jsonify({
-                    "run_id": run_id,
-                    "status": status_data['status'],
-                    "queue_position": status_data.get('queue_position', 0),
-                    "active_runs": active_runs,
-                    "max_runs": MAX_CONCURRENT_RUNS
-                })
+    """Get the status of a model run by ID.
+
+    With ?wait=<seconds>&since=<etag> this long-polls: the response is held
+    until the status differs from the one the client last saw.
+    """
+    wait = min(request.args.get('wait', 0, type=float), STATUS_LONG_POLL_MAX_SECONDS)
+    held = wait > 0 and hold_status_request()
+    try:
+        if held:
+            payload = wait_for_status_change(run_id, request.args.get('since'), wait)
         else:
-            return jsonify({"error": "Run ID not found"}), 404
+            payload = run_status_payload(run_id)
+    finally:
+        if held:
+            status_waiters.release()
+    if payload is None:
+        return jsonify({"error": "Run ID not found"}), 404
+    if wait > 0 and not held:
+        # Not held open; tell the client when to ask again
+        payload = dict(payload, poll_after=STATUS_POLL_INTERVAL_SECONDS)
+    return jsonify(payload)
+
+@app.route('/model_status/<run_id>/stream', methods=['GET'])
+def stream_model_status(run_id):
+    """Push status changes for a run as Server-Sent Events until it finishes."""
+    if job_store.get(run_id) is None:
+        return jsonify({"error": "Run ID not found"}), 404
+    if not hold_status_request():
+        # Clients fall back to polling /model_status
+        response = jsonify({"error": "Status streams unavailable", "poll_after": STATUS_POLL_INTERVAL_SECONDS})
+        response.headers['Retry-After'] = str(STATUS_POLL_INTERVAL_SECONDS)
+        return response, 503
+
+    def events():
+        since = None
+        while True:
+            payload = wait_for_status_change(run_id, since, STATUS_STREAM_HEARTBEAT_SECONDS)
+            if payload is None:
+                yield f"event: gone\ndata: {json.dumps({'error': 'Run ID not found'})}\n\n"
+                return
+            if payload['etag'] == since:
+                # Nothing changed; keep proxies from closing the connection
+                yield ": keep-alive\n\n"
+                continue
+            since = payload['etag']
+            yield f"id: {since}\ndata: {json.dumps(payload)}\n\n"
+            if payload['status'] in ['completed', 'error']:
+                return
+
+    response = Response(events(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(status_waiters.release)
+    return response
+
+@app.route('/system_status')
+def system_status():
+    """Report queue depth, active runs and model registry counters."""
+    counts = job_store.counts()
+    stages = job_store.stage_counts()
+    return jsonify({
+        "queue_size": counts.get('queued', 0),
+        "queue": job_store.queue_stats(),
+        "inference_queue_size": inference_queue.qsize(),
+        "render_queue_size": render_queue.qsize(),
+        "active_runs": stages.get('inference', 0),
+        "max_runs": MAX_CONCURRENT_RUNS,
+        "batch_size": BATCH_MAX_SIZE,
+        "stages": {
+            stage: {"runs": stages.get(stage, 0), "workers": workers}
+            for stage, workers in (('downloading', DOWNLOAD_WORKERS), ('inference', MAX_CONCURRENT_RUNS),
+                                   ('rendering', RENDER_WORKERS))
+        },
+        "waiting": {stage: stages.get(stage, 0) for stage in ('waiting for inference', 'waiting for render')},
+        "runs": counts,
+        "models": model_registry_status(),
+        "result_cache": result_cache.stats(),
+        "tiles": tile_cache.stats(),
+        "values": value_store.stats(),
+        "expiry": expiry.stats(),
+        "precompute": dict(precompute_stats, enabled=PRECOMPUTE_ENABLED),
+        "x86": x86_client.stats()
+    })
 
 # CDO error handling removed - errors are now handled uniformly
 
 @app.route('/get_data_metadata/<folder>')
 def get_data_metadata(folder):
-    """Get metadata about the variables in a data folder."""
+    """Get metadata about the variables in a data folder; values are fetched per layer."""
     try:
         data_dir = os.path.join(os.path.dirname(__file__), 'data', folder)
-        if not os.path.exists(data_dir):
+        if folder.startswith('.') or not os.path.exists(data_dir):
             return jsonify({"error": "Folder not found"}), 404
 
-        json_files = [f for f in os.listdir(data_dir) if f.endswith('.json')]
+        try:
+            with open(os.path.join(data_dir, METADATA_INDEX_NAME), 'r') as f:
+                variables = json.load(f)["variables"]
+        except FileNotFoundError:
+            variables = legacy_metadata(data_dir)
+
+        # Versioned product URLs are served as immutable
+        version = (result_cache.read_manifest(folder) or {}).get('version')
+        query = f"?v={version}" if version else ""
 
         metadata = {}
-        for json_file in json_files:
-            var_name = json_file.replace('.json', '')
-            with open(os.path.join(data_dir, json_file), 'r') as f:
-                json_data = json.load(f)
-                # Extract just the key information
-                metadata[var_name] = {
-                    "variable": var_name,
-                    "georeferencing": json_data.get("georeferencing", {}),
-                    "values": json_data.get("values", [])
-                }
+        for var_name, entry in variables.items():
+            entry = dict(entry)
+            entry["urls"] = {kind: f"/data/{folder}/{name}{query}" for kind, name in entry.get("products", {}).items()}
+            entry["urls"]["tiles"] = f"/tiles/{folder}/{var_name}/{{z}}/{{x}}/{{y}}.png{query}"
+            entry["urls"]["value"] = f"/value/{folder}/{var_name}"
+            metadata[var_name] = entry
 
         return jsonify(metadata)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def legacy_metadata(data_dir):
+    """Build metadata from the per-variable JSON files of folders rendered before the index existed."""
+    json_files = [f for f in os.listdir(data_dir) if f.endswith('.json') and f != MANIFEST_NAME]
+
+    variables = {}
+    for json_file in json_files:
+        var_name = json_file.replace('.json', '')
+        with open(os.path.join(data_dir, json_file), 'r') as f:
+            json_data = json.load(f)
+        # Extract just the key information
+        variables[var_name] = {
+            "variable": var_name,
+            "georeferencing": json_data.get("georeferencing", {}),
+            "shape": json_data.get("shape")
+        }
+    return variables
+
 @app.route('/splits/<lake_id>_split.csv')
 def serve_split_csv(lake_id):
     """Serve the split CSV file for a specific lake."""
@@ -372,78 +820,160 @@ def serve_split_csv(lake_id):
         if not os.path.exists(split_path):
             return "Split file not found", 404
 
-        with open(split_path, 'r') as f:
-            csv_content = f.read()
-
-        return csv_content, 200, {'Content-Type': 'text/csv'}
+        return send_static(os.path.dirname(split_path), os.path.basename(split_path))
     except Exception as e:
         return str(e), 500
 
+@app.route('/calendar/<lake>')
+def get_calendar(lake):
+    """Return a lake's train/val/test dates and missing inputs for the date picker."""
+    calendar = split_index.calendar(lake)
+    if calendar is None:
+        return jsonify({"error": f"No split calendar for {lake}"}), 404
+
+    body, etag = calendar
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/colorbars/<path:filename>')
 def serve_colorbars(filename):
-    """Serve static colorbar images."""
-    return send_from_directory(
+    """Serve static colorbar images; they only change with a deploy."""
+    return send_static(
         os.path.join(os.path.dirname(__file__), 'colorbars'),
-        filename
+        filename,
+        cache_control='public, max-age=86400'
     )
 
 # CDO error handling removed - function deleted
 
-def clean_data_directory():
-    """Clear all contents from the data directory"""
-    print(f"Cleaning data directory at {datetime.now(pytz.UTC).strftime('%Y-%m-%d %H:%M:%S')} UTC")
-    data_dir = os.path.join(os.path.dirname(__file__), 'data')
-    if os.path.exists(data_dir):
-        for item in os.listdir(data_dir):
-            item_path = os.path.join(data_dir, item)
-            try:
-                if os.path.isdir(item_path):
-                    shutil.rmtree(item_path)
-                else:
-                    os.remove(item_path)
-            except Exception as e:
-                print(f"Error removing {item_path}: {e}")
-    print("Data directory cleanup complete")
-
 def scheduled_cleanup():
-    """Function called by the scheduler to clean the data directory daily"""
+    """Function called by the scheduler to enforce result cache limits"""
     print(f"Executing scheduled cleanup at {datetime.now(pytz.UTC).strftime('%Y-%m-%d %H:%M:%S')} UTC")
-    clean_data_directory()
-    print("Daily cleanup complete - no restart needed")
+    try:
+        total = result_cache.evict()
+        print(f"Result cache cleanup complete - {total / (1024 ** 3):.2f} GB retained")
+        # Pick up folders added or removed outside the result cache
+        catalog.reload()
+    except Exception as e:
+        print(f"Error in scheduled cleanup: {e}")
+
+def precompute_candidates():
+    """Yield (lake, date string) for split dates, one split at a time and alternating between lakes."""
+    for split in PRECOMPUTE_SPLITS:
+        per_lake = [[(LAKE_NAMES[initial].lower(), f"{date} {hour:02d}:00")
+                     for date in split_index.dates(initial, split) for hour in PRECOMPUTE_HOURS]
+                    for initial in LAKE_NAMES]
+        for round_ in itertools.zip_longest(*per_lake):
+            yield from (candidate for candidate in round_ if candidate is not None)
+
+
+def precompute_split_dates():
+    """Queue the next uncached split date at backfill priority while nothing else is waiting.
+
+    Only the process holding the precompute lease submits. Stops as soon
+    as interactive or prefetch runs are queued or processing; backfill runs
+    already queued are claimed after them. Dates are checked against the
+    result cache on every pass, so evicted results are computed again; a
+    date whose run failed is retried once that run's status expires.
+    """
+    if not job_store.acquire_lease(PRECOMPUTE_LEASE, WORKER_OWNER, PRECOMPUTE_LEASE_SECONDS):
+        return
+    active = job_store.active_by_priority()
+    if active.get('interactive', 0) or active.get('prefetch', 0):
+        return
+    capacity = PRECOMPUTE_MAX_ACTIVE - active.get('backfill', 0)
+    found = {'cached': 0, 'missing': 0, 'failed': 0}
+    for lake, date_str in precompute_candidates():
+        if capacity <= 0:
+            break
+        fname = datetime.strptime(date_str, '%Y-%m-%d %H:00').strftime('%Y%m%d_%H') + lake[0]
+        if split_index.is_missing(fname):
+            found['missing'] += 1
+            continue
+        version = model_version(lake)
+        # read_manifest rather than lookup, so precompute checks do not count as accesses
+        manifest = result_cache.read_manifest(fname)
+        if manifest is not None and manifest.get('version') == version:
+            found['cached'] += 1
+            continue
+        job_key = f"{lake}/{fname}/{version}"
+        if job_store.last_status(job_key) == 'error':
+            found['failed'] += 1
+            continue
+
+        run_id, coalesced = job_store.submit(lake, date_str, job_key, priority='backfill', client=PRECOMPUTE_CLIENT)
+        if not coalesced:
+            print(f"Precomputing {lake} at {date_str} as {run_id}")
+            precompute_stats['submitted'] += 1
+            with run_queued:
+                run_queued.notify()
+            capacity -= 1
+    precompute_stats.update(found)
 
 # Initialize the scheduler
 def init_scheduler():
     """Set up the scheduler with jobs"""
     scheduler.init_app(app)
 
-    # Add job to clean data directory daily at 06:00 UTC
+    # Add job to evict expired and excess results at the top of every hour
     scheduler.add_job(
         id='scheduled_cleanup',
         func=scheduled_cleanup,
         trigger='cron',
-        hour=6,
         minute=0,
         timezone=pytz.UTC
     )
 
+    if PRECOMPUTE_ENABLED:
+        # Fill idle capacity with the split dates users are most likely to pick
+        scheduler.add_job(
+            id='precompute_split_dates',
+            func=precompute_split_dates,
+            trigger='interval',
+            seconds=PRECOMPUTE_INTERVAL_SECONDS,
+            max_instances=1,
+            coalesce=True
+        )
+
     scheduler.start()
-    print("Scheduler started - Daily cleanup scheduled for 06:00 UTC")
+    print("Scheduler started - Result cache cleanup scheduled hourly")
 
 # Start worker threads for the model queue
 def start_workers():
-    """Start worker threads to process the model queue"""
-    print(f"Starting {MAX_CONCURRENT_RUNS} worker threads for model queue")
+    """Start worker threads for each stage of the model pipeline"""
+    if WORKER_MODE == 'process':
+        # Each worker process loads its own models in init_worker_process;
+        # this waits until every inference worker has started and warmed up
+        get_process_pool('inference')
+    elif WARM_UP_MODELS:
+        # Warm up in the background so startup is not blocked on torch.load
+        threading.Thread(
+            target=model_registry.warm_up,
+            daemon=True,
+            name="model-warmup"
+        ).start()
+        print("Started model registry warm-up thread")
+
+    print(f"Starting pipeline workers ({WORKER_MODE} mode): {DOWNLOAD_WORKERS} download, "
+          f"{MAX_CONCURRENT_RUNS} inference, {RENDER_WORKERS} render")
+    stages = (
+        [(download_worker, f"download-worker-{i}") for i in range(DOWNLOAD_WORKERS)] +
+        [(inference_worker, f"inference-worker-{i}") for i in range(MAX_CONCURRENT_RUNS)] +
+        [(render_worker, f"render-worker-{i}") for i in range(RENDER_WORKERS)]
+    )
     workers = []
 
-    for i in range(MAX_CONCURRENT_RUNS):
+    for target, name in stages:
         worker = threading.Thread(
-            target=process_model_queue,
+            target=target,
             daemon=True,
-            name=f"model-worker-{i}"
+            name=name
         )
         worker.start()
         workers.append(worker)
-        print(f"Started model worker thread {i}")
+        print(f"Started {name}")
 
     # Add a monitoring thread to ensure worker threads stay alive
     def monitor_workers():
@@ -451,11 +981,12 @@ def start_workers():
             time.sleep(60)  # Check every minute
             for i, worker in enumerate(workers):
                 if not worker.is_alive():
-                    print(f"Worker {i} died, restarting...")
+                    target, name = stages[i]
+                    print(f"Worker {name} died, restarting...")
                     new_worker = threading.Thread(
-                        target=process_model_queue,
+                        target=target,
                         daemon=True,
-                        name=f"model-worker-{i}-restarted"
+                        name=f"{name}-restarted"
                     )
                     new_worker.start()
                     workers[i] = new_worker
@@ -468,61 +999,17 @@ def start_workers():
     monitor_thread.start()
     print("Started worker monitoring thread")
 
-# Function to clean up stale model status entries
-def cleanup_stale_status():
-    """Periodically clean up stale entries in the model_status dictionary"""
-    while True:
-        time.sleep(3600)  # Run every hour
-        try:
-            with status_lock:
-                current_time = datetime.now()
-                stale_ids = []
-
-                for run_id, status in model_status.items():
-                    try:
-                        # Parse the submission time
-                        submitted_at = datetime.fromisoformat(status.get('submitted_at', ''))
-                        # If it's older than 24 hours and in a terminal state, mark for cleanup
-                        age_hours = (current_time - submitted_at).total_seconds() / 3600
-                        if age_hours > 24 and status.get('status') in ['completed', 'error']:
-                            stale_ids.append(run_id)
-                        elif age_hours > 72:  # If older than 3 days, clean up regardless of status
-                            stale_ids.append(run_id)
-                            print(f"Cleaning up very old run {run_id} (status: {status.get('status')})")
-                    except Exception as e:
-                        # If we can't parse the time, check if it's a terminal state
-                        if status.get('status') in ['completed', 'error']:
-                            stale_ids.append(run_id)
-                            print(f"Cleaning up run with invalid time format: {run_id}")
-
-                # Remove stale entries
-                for run_id in stale_ids:
-                    del model_status[run_id]
-
-                if stale_ids:
-                    print(f"Cleaned up {len(stale_ids)} stale model status entries")
-        except Exception as e:
-            print(f"Error in cleanup_stale_status: {e}")
-
-# Start the cleanup thread
-cleanup_thread = threading.Thread(
-    target=cleanup_stale_status,
-    daemon=True,
-    name="status-cleanup"
-)
-cleanup_thread.start()
-
 # Start a thread to periodically log active runs and queue size
 def log_system_status():
     """Periodically log information about system status"""
     while True:
         time.sleep(300)  # Every 5 minutes
         try:
-            with status_lock:
-                queue_size = model_queue.qsize()
-                active = active_runs
-                total_statuses = len(model_status)
-                print(f"System status: Active runs: {active}, Queue size: {queue_size}, Status entries: {total_statuses}")
+            counts = job_store.counts()
+            print(f"System status: Active runs: {counts.get('processing', 0)}, Queue size: {counts.get('queued', 0)}, "
+                  f"Status entries: {sum(counts.values())}, "
+                  f"Inference queue: {inference_queue.qsize()}, Render queue: {render_queue.qsize()}")
+            print(f"Model registry: {model_registry_status()}")
         except Exception as e:
             print(f"Error in log_system_status: {e}")
 
@@ -531,12 +1018,23 @@ status_logger = threading.Thread(
     daemon=True,
     name="status-logger"
 )
-status_logger.start()
+if not IS_WORKER_PROCESS:
+    status_logger.start()
 
 # Initialize workers outside the main block so they start
 # even when run by a WSGI server like gunicorn
-init_scheduler()
-start_workers()
+if not IS_WORKER_PROCESS:
+    # Runs interrupted by a restart go back in the queue
+    requeue_orphaned_runs()
+    catalog.reload()
+    for fname, _, _ in result_cache.entries():
+        schedule_retention(fname)
+    expiry.every(('jobs', 'orphans'), ORPHAN_CHECK_SECONDS, requeue_orphaned_runs)
+    expiry.every(('jobs', 'stale'), STALE_RUN_SWEEP_SECONDS, reap_stale_runs)
+    expiry.start()
+    precompress_dir(os.path.join(os.path.dirname(__file__), 'splits'))
+    init_scheduler()
+    start_workers()
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,163 @@
+import os
+import hashlib
+import threading
+from datetime import datetime
+
+from result_cache import STAGING_DIR
+
+# Lake initial used in folder names (YYYYMMDD_HHl) -> display name
+LAKE_NAMES = {'e': 'Erie', 'm': 'Michigan', 'o': 'Ontario', 's': 'Superior'}
+
+
+def parse_folder(folder):
+    """Return (valid time, lake name) for a YYYYMMDD_HHl folder name, or None."""
+    if len(folder) != 12 or folder[11] not in LAKE_NAMES:
+        return None
+    try:
+        valid_time = datetime.strptime(folder[:11], '%Y%m%d_%H')
+    except ValueError:
+        return None
+    return valid_time, LAKE_NAMES[folder[11]]
+
+
+class Catalog:
+    """In-memory list of completed model output folders.
+
+    Built from one scan of data/ at startup, then kept current by the
+    result cache's publish and remove hooks, so listing rarely touches the
+    filesystem. Folders published or removed by another worker process
+    change the modification time of data/, which is checked on each read
+    and triggers a rescan; the hooks record the time their own change
+    left, so this process's publishes do not. The ETag hashes the entries themselves, so
+    every process serving the same folders returns the same ETag.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._entries = {}
+        self._sorted = None
+        self._etag = None
+        self._root_mtime = None
+        self._lock = threading.Lock()
+        self.version = 0
+
+    @property
+    def etag(self):
+        self.refresh()
+        with self._lock:
+            if self._etag is None:
+                digest = hashlib.sha1()
+                for folder in sorted(self._entries):
+                    digest.update(f"{folder}:{self._entries[folder]['ctime']}\n".encode())
+                self._etag = digest.hexdigest()[:16]
+            return self._etag
+
+    def _changed(self):
+        """Invalidate derived state after an update. Call with _lock held."""
+        self._sorted = None
+        self._etag = None
+        self.version += 1
+
+    def _root_signature(self):
+        try:
+            return os.stat(self.root).st_mtime_ns
+        except OSError:
+            return None
+
+    def refresh(self):
+        """Rescan if entries were added to or removed from data/ since the last scan."""
+        if self._root_signature() != self._root_mtime:
+            self.reload()
+
+    def _entry(self, folder, ctime):
+        parsed = parse_folder(folder)
+        if parsed is None:
+            return None
+        valid_time, lake = parsed
+        return {
+            "folder": folder,
+            "date": valid_time.strftime('%Y-%m-%d %H:00'),
+            "lake": lake,
+            "ctime": ctime
+        }
+
+    def reload(self):
+        """Rebuild the catalog from the folders on disk that contain an out.nc."""
+        # Taken before the scan, so changes made during it trigger another
+        root_mtime = self._root_signature()
+        entries = {}
+        if os.path.exists(self.root):
+            for folder in os.listdir(self.root):
+                if folder == STAGING_DIR:
+                    continue
+                try:
+                    ctime = os.stat(os.path.join(self.root, folder, 'out.nc')).st_ctime
+                except OSError:
+                    continue
+                entry = self._entry(folder, ctime)
+                if entry is not None:
+                    entries[folder] = entry
+
+        with self._lock:
+            self._root_mtime = root_mtime
+            if entries != self._entries:
+                self._entries = entries
+                self._changed()
+
+    def add(self, folder):
+        """Record a newly published folder."""
+        try:
+            ctime = os.stat(os.path.join(self.root, folder, 'out.nc')).st_ctime
+        except OSError:
+            return
+        entry = self._entry(folder, ctime)
+        if entry is None:
+            return
+        # The publish renamed the folder into data/; that change is this one
+        root_mtime = self._root_signature()
+        with self._lock:
+            self._entries[folder] = entry
+            self._root_mtime = root_mtime
+            self._changed()
+
+    def remove(self, folder):
+        """Forget a deleted folder."""
+        root_mtime = self._root_signature()
+        with self._lock:
+            self._root_mtime = root_mtime
+            if self._entries.pop(folder, None) is not None:
+                self._changed()
+
+    def query(self, lake=None, start=None, end=None, offset=0, limit=None):
+        """Return (total, page) of entries, most recently created first.
+
+        lake matches a lake name or initial; start and end bound the valid
+        time inclusively as 'YYYY-MM-DD' or 'YYYY-MM-DD HH:00' strings.
+        """
+        # A bare date covers the whole day
+        if start and len(start) == 10:
+            start += " 00:00"
+        if end and len(end) == 10:
+            end += " 23:00"
+
+        self.refresh()
+        with self._lock:
+            if self._sorted is None:
+                self._sorted = sorted(self._entries.values(), key=lambda entry: entry["ctime"], reverse=True)
+            entries = self._sorted
+
+        if lake:
+            lake = lake.lower()
+            entries = [entry for entry in entries if lake in (entry["lake"].lower(), entry["lake"][0].lower())]
+        if start:
+            entries = [entry for entry in entries if entry["date"] >= start]
+        if end:
+            entries = [entry for entry in entries if entry["date"] <= end]
+
+        total = len(entries)
+        page = entries[offset:offset + limit] if limit is not None else entries[offset:]
+        return total, page
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,109 @@
+import time
+import heapq
+import logging
+import itertools
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Rebuild the heap once superseded entries outnumber live ones by this factor
+EXPIRY_HEAP_SLACK = 2
+
+
+class ExpiryScheduler:
+    """Runs callbacks at their deadlines from a single background thread.
+
+    Pending deadlines live in a heap, so scheduling and cancelling cost
+    O(log n) however many are outstanding, and the thread sleeps until the
+    earliest one. Keys are (kind, id) tuples; scheduling a key again
+    replaces its deadline and the superseded heap entry is skipped when it
+    surfaces. Callbacks should be quick; they run one at a time.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._entries = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.expired = Counter()
+        self.errors = 0
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="expiry-scheduler")
+                self._thread.start()
+
+    def schedule(self, key, delay, callback):
+        """Run callback after delay seconds, replacing any deadline already set for key."""
+        deadline = time.monotonic() + max(0.0, delay)
+        with self._cond:
+            seq = next(self._seq)
+            self._entries[key] = (deadline, seq, callback)
+            heapq.heappush(self._heap, (deadline, seq, key))
+            if len(self._heap) > EXPIRY_HEAP_SLACK * len(self._entries) + 64:
+                self._heap = [(d, s, k) for k, (d, s, _) in self._entries.items()]
+                heapq.heapify(self._heap)
+            # Wake the thread if this is now the earliest deadline
+            if self._heap[0][1] == seq:
+                self._cond.notify()
+
+    def every(self, key, interval, callback):
+        """Run callback every interval seconds, starting one interval from now."""
+        def repeat():
+            try:
+                callback()
+            finally:
+                self.schedule(key, interval, repeat)
+        self.schedule(key, interval, repeat)
+
+    def cancel(self, key):
+        with self._cond:
+            return self._entries.pop(key, None) is not None
+
+    def _next_due(self):
+        """Pop and return the next due callback, waiting as needed. Call with _cond held."""
+        while True:
+            if not self._heap:
+                self._cond.wait()
+                continue
+            deadline, seq, key = self._heap[0]
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != seq:
+                # Cancelled or rescheduled
+                heapq.heappop(self._heap)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                self._cond.wait(remaining)
+                continue
+            heapq.heappop(self._heap)
+            del self._entries[key]
+            return key, entry[2]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                key, callback = self._next_due()
+            try:
+                callback()
+                with self._cond:
+                    self.expired[key[0]] += 1
+            except Exception as e:
+                with self._cond:
+                    self.errors += 1
+                logger.warning(f"Expiry callback for {key} failed: {e}")
+
+    def stats(self):
+        with self._cond:
+            live = Counter(key[0] for key in self._entries)
+            return {
+                'live': len(self._entries),
+                'live_by_kind': dict(live),
+                'expired': sum(self.expired.values()),
+                'expired_by_kind': dict(self.expired),
+                'errors': self.errors,
+                'heap_size': len(self._heap)
+            }
@@ -0,0 +1,408 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# SQLite database shared by every web worker; ':memory:' keeps jobs in this process only
+JOB_STORE_PATH = os.environ.get('LESWEB_JOB_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.sqlite3'))
+# Seconds a connection waits for another process's write lock
+JOB_STORE_BUSY_TIMEOUT = 30
+# Statuses of runs that still hold a place in the pipeline
+ACTIVE_STATUSES = ('queued', 'processing')
+# Statuses of runs whose result is final
+FINISHED_STATUSES = ('completed', 'error')
+# Priority classes, most urgent first: clicks in the UI, speculative work, bulk historical runs
+PRIORITY_CLASSES = ('interactive', 'prefetch', 'backfill')
+# A queued run is promoted one priority class for every this many seconds it waits
+PRIORITY_AGING_SECONDS = float(os.environ.get('LESWEB_PRIORITY_AGING_SECONDS', 600))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lake TEXT NOT NULL,
+    date TEXT NOT NULL,
+    job_key TEXT,
+    priority TEXT NOT NULL DEFAULT 'interactive',
+    client TEXT,
+    status TEXT NOT NULL,
+    stage TEXT,
+    result TEXT,
+    owner TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_by_status ON runs (status, id);
+CREATE INDEX IF NOT EXISTS runs_by_job_key ON runs (job_key, status);
+-- Bumped by every committed change, so readers can tell cheaply whether anything moved
+CREATE TABLE IF NOT EXISTS store_version (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL);
+INSERT OR IGNORE INTO store_version (id, version) VALUES (0, 0);
+-- Background tasks that only one process may run at a time
+CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL);
+"""
+# Columns added after the first release, for databases created before them
+COLUMN_MIGRATIONS = {
+    'priority': "ALTER TABLE runs ADD COLUMN priority TEXT NOT NULL DEFAULT 'interactive'",
+    'client': "ALTER TABLE runs ADD COLUMN client TEXT"
+}
+
+
+def process_owner():
+    """Identify this process as host:pid:token; the token tells a restarted process from its predecessor."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def owner_alive(owner):
+    """Whether the process named by owner may still be running.
+
+    Only processes on this host can be checked; others are assumed alive.
+    """
+    try:
+        host, pid, _ = owner.split(':')
+        pid = int(pid)
+    except (AttributeError, ValueError):
+        return False
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def schedule_order(queued, active_by_client, now):
+    """Order queued runs the way claim_next serves them.
+
+    queued holds (id, priority, client, submitted_at) tuples. Runs are
+    ranked by priority class, promoted one class per PRIORITY_AGING_SECONDS
+    of waiting, then served round-robin across clients within a class: a
+    client's n-th run in a class (counting the runs it already has
+    processing) waits for every other client's earlier rounds. Ties go to
+    the oldest submission. Returns the ids in order.
+    """
+    keyed = []
+    for row_id, priority, client, submitted_at in queued:
+        rank = PRIORITY_CLASSES.index(priority) if priority in PRIORITY_CLASSES else len(PRIORITY_CLASSES)
+        if PRIORITY_AGING_SECONDS > 0:
+            # A run stamped after now by another process has not waited yet
+            rank = max(0, rank - int(max(0, now - submitted_at) // PRIORITY_AGING_SECONDS))
+        keyed.append((rank, row_id, client))
+    keyed.sort()
+
+    rounds = {}
+    ordered = []
+    for rank, row_id, client in keyed:
+        turn = rounds.get((rank, client), active_by_client.get(client, 0))
+        rounds[(rank, client)] = turn + 1
+        ordered.append((rank, turn, row_id))
+    ordered.sort()
+    return [row_id for _, _, row_id in ordered]
+
+
+def next_promotion(queued, now):
+    """Earliest time after now at which aging moves one of the queued runs up a class."""
+    if PRIORITY_AGING_SECONDS <= 0:
+        return float('inf')
+    soonest = float('inf')
+    for _, priority, _, submitted_at in queued:
+        rank = PRIORITY_CLASSES.index(priority) if priority in PRIORITY_CLASSES else len(PRIORITY_CLASSES)
+        promoted = int(max(0, now - submitted_at) // PRIORITY_AGING_SECONDS)
+        if promoted < rank:
+            soonest = min(soonest, submitted_at + (promoted + 1) * PRIORITY_AGING_SECONDS)
+    return soonest
+
+
+def run_id_of(row_id):
+    return f"run_{row_id}"
+
+
+def row_id_of(run_id):
+    """Row id for a run_<n> id, or None if it is not one."""
+    prefix, _, number = str(run_id).partition('_')
+    if prefix != 'run' or not number.isdigit():
+        return None
+    return int(number)
+
+
+class SQLiteJobStore:
+    """Durable queue and status table for model runs.
+
+    Every web worker process opens the same database, so any of them can
+    accept a run, claim queued work or answer a status request. WAL mode
+    lets status reads proceed while a worker writes. Runs left 'processing'
+    by a process that died are put back in the queue by requeue_orphans.
+
+    Runs are identified to clients as run_<row id>; rows are never reused.
+    """
+
+    def __init__(self, path=JOB_STORE_PATH):
+        if path == ':memory:':
+            # Shared between this process's threads for as long as one connection stays open
+            self._target = f"file:lesweb-jobs-{uuid.uuid4().hex[:8]}?mode=memory&cache=shared"
+        else:
+            self._target = f"file:{path}"
+        self.path = path
+        self._local = threading.local()
+        # (store version, valid until, claim order, position of each id) of the last schedule computed
+        self._order = None
+        self._order_lock = threading.Lock()
+        conn = self._conn()
+        if path != ':memory:':
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(runs)")}
+        for column, statement in COLUMN_MIGRATIONS.items():
+            if column not in columns:
+                conn.execute(statement)
+        self._keepalive = conn if path == ':memory:' else None
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit; multi-statement updates use explicit transactions
+            conn = sqlite3.connect(self._target, uri=True, timeout=JOB_STORE_BUSY_TIMEOUT,
+                                   isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Take the write lock up front so read-then-write sequences are atomic across processes."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        changes = conn.total_changes
+        try:
+            yield conn
+            if conn.total_changes != changes:
+                conn.execute("UPDATE store_version SET version = version + 1 WHERE id = 0")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def version(self):
+        """Token that changes whenever any process commits a change, or aging reorders the queue."""
+        counter = self._conn().execute("SELECT version FROM store_version WHERE id = 0").fetchone()[0]
+        with self._order_lock:
+            aged = self._order is not None and time.time() >= self._order[1]
+        return counter, aged
+
+    def _row(self, row):
+        run = dict(row)
+        run['run_id'] = run_id_of(run.pop('id'))
+        run['result'] = json.loads(run['result']) if run['result'] is not None else None
+        return run
+
+    def submit(self, lake, date, job_key, result=None, priority='interactive', client=None):
+        """Queue a run, or record an already finished one when result is given.
+
+        A queued or processing run with the same job_key is reused instead
+        of adding a duplicate; a queued one is raised to priority if that is
+        more urgent, and handed to client. Returns (run_id, coalesced).
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class {priority!r}")
+        now = time.time()
+        with self._transaction() as conn:
+            if result is None:
+                existing = conn.execute(
+                    "SELECT id, status, priority FROM runs WHERE job_key = ? AND status IN (?, ?) ORDER BY id LIMIT 1",
+                    (job_key, *ACTIVE_STATUSES)).fetchone()
+                if existing is not None:
+                    if (existing['status'] == 'queued' and
+                            PRIORITY_CLASSES.index(priority) < PRIORITY_CLASSES.index(existing['priority'])):
+                        conn.execute("UPDATE runs SET priority = ?, client = ?, updated_at = ? WHERE id = ?",
+                                     (priority, client, now, existing['id']))
+                    return run_id_of(existing['id']), True
+                cursor = conn.execute(
+                    "INSERT INTO runs (lake, date, job_key, priority, client, status, submitted_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                    (lake, date, job_key, priority, client, now, now))
+            else:
+                cursor = conn.execute(
+                    "INSERT INTO runs (lake, date, job_key, priority, client, status, result, submitted_at, "
+                    "finished_at, updated_at) VALUES (?, ?, ?, ?, ?, 'completed', ?, ?, ?, ?)",
+                    (lake, date, job_key, priority, client, json.dumps(result), now, now, now))
+            return run_id_of(cursor.lastrowid), False
+
+    def _schedule(self, conn):
+        """Return (queued run ids in claim order, {id: position}).
+
+        The order is computed once per store version and reused by every
+        status read and claim until the store changes or a run ages into
+        a higher class.
+        """
+        version = conn.execute("SELECT version FROM store_version WHERE id = 0").fetchone()[0]
+        now = time.time()
+        with self._order_lock:
+            cached = self._order
+        if cached is not None and cached[0] == version and now < cached[1]:
+            return cached[2], cached[3]
+
+        queued = [tuple(row) for row in conn.execute(
+            "SELECT id, priority, client, submitted_at FROM runs WHERE status = 'queued'").fetchall()]
+        active = conn.execute(
+            "SELECT client, COUNT(*) FROM runs WHERE status = 'processing' GROUP BY client").fetchall()
+        order = schedule_order(queued, {client: count for client, count in active}, now)
+        positions = {row_id: position for position, row_id in enumerate(order)}
+        with self._order_lock:
+            self._order = (version, next_promotion(queued, now), order, positions)
+        return order, positions
+
+    def get(self, run_id):
+        """Return a run as a dict, with its queue_position while queued, or None if unknown."""
+        row_id = row_id_of(run_id)
+        if row_id is None:
+            return None
+        conn = self._conn()
+        # One snapshot, so the run and the schedule agree
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT * FROM runs WHERE id = ?", (row_id,)).fetchone()
+            if row is None:
+                return None
+            run = self._row(row)
+            run['queue_position'] = 0
+            if run['status'] == 'queued':
+                # Runs that will be claimed before this one
+                order, positions = self._schedule(conn)
+                run['queue_position'] = positions.get(row_id, len(order))
+            return run
+        finally:
+            conn.execute("COMMIT")
+
+    def claim_next(self, owner):
+        """Mark the first queued run in schedule order as processing by owner.
+
+        Returns the run, or None if the queue is empty.
+        """
+        # Idle workers poll; check without taking the write lock first
+        if self._conn().execute("SELECT 1 FROM runs WHERE status = 'queued' LIMIT 1").fetchone() is None:
+            return None
+        now = time.time()
+        with self._transaction() as conn:
+            order, _ = self._schedule(conn)
+            if not order:
+                return None
+            conn.execute(
+                "UPDATE runs SET status = 'processing', stage = 'downloading', owner = ?, "
+                "attempts = attempts + 1, started_at = ?, updated_at = ? WHERE id = ?",
+                (owner, now, now, order[0]))
+            return self._row(conn.execute("SELECT * FROM runs WHERE id = ?", (order[0],)).fetchone())
+
+    def set_stage(self, run_ids, stage):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany("UPDATE runs SET stage = ?, updated_at = ? WHERE id = ?",
+                             [(stage, now, row_id_of(run_id)) for run_id in run_ids])
+
+    def finish(self, run_ids, status, result):
+        """Record the final status and result of runs. Returns the number of runs updated."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.executemany(
+                "UPDATE runs SET status = ?, result = ?, stage = NULL, finished_at = ?, updated_at = ? WHERE id = ?",
+                [(status, json.dumps(result), now, now, row_id_of(run_id)) for run_id in run_ids])
+            return cursor.rowcount
+
+    def counts(self):
+        """Number of runs in each status."""
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM runs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def stage_counts(self):
+        """Number of processing runs in each pipeline stage."""
+        rows = self._conn().execute(
+            "SELECT stage, COUNT(*) FROM runs WHERE status = 'processing' GROUP BY stage").fetchall()
+        return {stage: count for stage, count in rows}
+
+    def active_by_priority(self):
+        """Number of queued or processing runs in each priority class."""
+        rows = self._conn().execute(
+            "SELECT priority, COUNT(*) FROM runs WHERE status IN (?, ?) GROUP BY priority", ACTIVE_STATUSES).fetchall()
+        return {priority: count for priority, count in rows}
+
+    def queue_stats(self):
+        """Queued runs per priority class and the number of distinct clients waiting."""
+        conn = self._conn()
+        rows = conn.execute("SELECT priority, COUNT(*) FROM runs WHERE status = 'queued' GROUP BY priority").fetchall()
+        clients = conn.execute("SELECT COUNT(DISTINCT client) FROM runs WHERE status = 'queued'").fetchone()[0]
+        return {'by_priority': {priority: count for priority, count in rows}, 'clients': clients}
+
+    def requeue_orphans(self, owner):
+        """Put runs claimed by dead processes, or by a previous process with owner's pid, back in the queue."""
+        host, pid, _ = owner.split(':')
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT id, owner FROM runs WHERE status = 'processing'").fetchall()
+            orphans = [row['id'] for row in rows
+                       if row['owner'] != owner and
+                       (not owner_alive(row['owner']) or str(row['owner']).startswith(f"{host}:{pid}:"))]
+            conn.executemany(
+                "UPDATE runs SET status = 'queued', stage = NULL, owner = NULL, updated_at = ? WHERE id = ?",
+                [(now, row_id) for row_id in orphans])
+        if orphans:
+            logger.info(f"Requeued {len(orphans)} interrupted runs")
+        return len(orphans)
+
+    def last_status(self, job_key):
+        """Status of the newest run for job_key still in the store, or None."""
+        row = self._conn().execute(
+            "SELECT status FROM runs WHERE job_key = ? ORDER BY id DESC LIMIT 1", (job_key,)).fetchone()
+        return row['status'] if row is not None else None
+
+    def acquire_lease(self, name, owner, ttl):
+        """Take or renew the lease called name for owner, for ttl seconds.
+
+        Returns whether owner holds it. A lease that was not renewed in
+        time, or whose owner has died, is taken over.
+        """
+        now = time.time()
+        conn = self._conn()
+        # Not through _transaction: leases do not change runs, so the store version stays put
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            held = (row is None or row['owner'] == owner or row['expires_at'] < now or
+                    not owner_alive(row['owner']))
+            if held:
+                conn.execute("INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                             (name, owner, now + ttl))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return held
+
+    def delete_finished(self, run_id):
+        """Remove a run if it has finished. Returns whether it was removed."""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM runs WHERE id = ? AND status IN (?, ?)", (row_id_of(run_id), *FINISHED_STATUSES))
+            return cursor.rowcount > 0
+
+    def expire(self, finished_before, submitted_before):
+        """Remove runs finished before finished_before, and any run submitted before submitted_before.
+
+        Returns the number of runs removed.
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "DELETE FROM runs WHERE (status IN (?, ?) AND COALESCE(finished_at, submitted_at) < ?) "
+                "OR submitted_at < ?",
+                (*FINISHED_STATUSES, finished_before, submitted_before))
+            return cursor.rowcount
@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+
+from value_store import ValueGrid
+
+# Observed precipitation every forecast is verified against
+METRIC_TARGET = "QPE_target"
+# Forecasts verified against METRIC_TARGET
+METRIC_FORECASTS = ["LESNet-A", "LESNet-B", "QPE_hrrr"]
+# Snowfall thresholds (mm) for the hit/miss/CSI contingency scores
+METRIC_THRESHOLDS = [float(t) for t in os.environ.get('LESWEB_METRIC_THRESHOLDS', '1,5,10,25').split(',')]
+
+
+def load_values(out_dir, var):
+    """Read the preprocessed values of var from its value grid in out_dir."""
+    grid = ValueGrid(os.path.join(out_dir, f"{var}.json"))
+    return grid.decode(grid.values)
+
+
+def score(forecast, target, thresholds=METRIC_THRESHOLDS):
+    """Continuous and categorical scores of forecast against target over the valid cells."""
+    valid = np.isfinite(forecast) & np.isfinite(target)
+    forecast, target = forecast[valid], target[valid]
+    if forecast.size == 0:
+        return None
+
+    error = forecast - target
+    result = {
+        'count': int(forecast.size),
+        'mae': float(np.abs(error).mean()),
+        'bias': float(error.mean()),
+        'rmse': float(np.sqrt(np.square(error).mean())),
+        'thresholds': {}
+    }
+    for threshold in thresholds:
+        predicted = forecast >= threshold
+        observed = target >= threshold
+        hits = int(np.count_nonzero(predicted & observed))
+        misses = int(np.count_nonzero(~predicted & observed))
+        false_alarms = int(np.count_nonzero(predicted & ~observed))
+        events = hits + misses + false_alarms
+        result['thresholds'][f"{threshold:g}"] = {
+            'hits': hits,
+            'misses': misses,
+            'false_alarms': false_alarms,
+            'csi': hits / events if events else None
+        }
+    return result
+
+
+def verification_metrics(out_dir, thresholds=METRIC_THRESHOLDS):
+    """Score every available forecast in out_dir against METRIC_TARGET.
+
+    Returns None if the folder has no target grid.
+    """
+    try:
+        target = load_values(out_dir, METRIC_TARGET)
+    except FileNotFoundError:
+        return None
+
+    forecasts = {}
+    for var in METRIC_FORECASTS:
+        try:
+            forecasts[var] = score(load_values(out_dir, var), target, thresholds)
+        except FileNotFoundError:
+            continue
+    return {
+        'target': METRIC_TARGET,
+        'units': 'mm',
+        'thresholds': [f"{threshold:g}" for threshold in thresholds],
+        'forecasts': forecasts
+    }
@@ -0,0 +1,169 @@
+import os
+import time
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Keep-alive connections kept open to the service; one per concurrent download worker
+REMOTE_POOL_SIZE = int(os.environ.get('LESWEB_X86_POOL_SIZE', 4))
+# Bytes read from the socket and written to disk per call
+REMOTE_CHUNK_SIZE = int(os.environ.get('LESWEB_X86_CHUNK_SIZE', 1024 * 1024))
+# Seconds to establish a connection before giving up
+REMOTE_CONNECT_TIMEOUT = 10
+# Log download progress every this many bytes
+REMOTE_PROGRESS_BYTES = 50 * 1024 * 1024
+
+
+class DownloadError(Exception):
+    """A transfer stopped early; the bytes received so far are kept for resuming."""
+
+
+class RemoteClient:
+    """HTTP client for the x86 preprocessing service.
+
+    One requests.Session is shared by every download worker, so
+    connections are reused across runs instead of reopened per request.
+    Downloads are read into one preallocated buffer and, when retried,
+    continue from the bytes already on disk with an HTTP Range request.
+    """
+
+    def __init__(self, base_url, pool_size=REMOTE_POOL_SIZE, chunk_size=REMOTE_CHUNK_SIZE):
+        self.base_url = base_url.rstrip('/')
+        self.chunk_size = chunk_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # ETag or Last-Modified of partially downloaded files, for If-Range
+        self._validators = {}
+        self._lock = threading.Lock()
+        self.downloads = 0
+        self.failures = 0
+        self.resumes = 0
+        self.bytes_downloaded = 0
+        self.bytes_resumed = 0
+        self.seconds_downloading = 0.0
+        self.last_rate = None
+
+    def post_json(self, path, payload, timeout):
+        """POST payload as JSON and return the decoded response body.
+
+        Raises RuntimeError with the service's error message on a non-200 reply.
+        """
+        response = self.session.post(f"{self.base_url}{path}", json=payload,
+                                     timeout=(REMOTE_CONNECT_TIMEOUT, timeout))
+        if response.status_code != 200:
+            try:
+                error_msg = response.json().get('error', 'Unknown error')
+            except ValueError:
+                error_msg = f"HTTP {response.status_code}"
+            raise RuntimeError(f"Remote processing failed: {error_msg}")
+        return response.json()
+
+    def download(self, path, dest, timeout):
+        """Stream path to the file dest, resuming if dest already holds part of it.
+
+        Raises DownloadError if the transfer stops early; dest then holds
+        only complete bytes, so calling again continues where it stopped.
+        """
+        offset = os.path.getsize(dest) if os.path.exists(dest) else 0
+        # Byte ranges address the stored file, not an encoded transfer
+        headers = {'Accept-Encoding': 'identity'}
+        validator = self._validators.get(dest)
+        if offset and validator:
+            headers['Range'] = f"bytes={offset}-"
+            headers['If-Range'] = validator
+
+        try:
+            size, resumed_from, elapsed = self._transfer(path, dest, offset, headers, timeout)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+
+        self._validators.pop(dest, None)
+        with self._lock:
+            self.downloads += 1
+        rate = (size - resumed_from) / (1024 * 1024 * max(elapsed, 1e-6))
+        logger.info(f"Downloaded {dest}: {size / (1024 * 1024):.1f} MB at {rate:.1f} MB/s"
+                    f"{f', resumed at byte {resumed_from}' if resumed_from else ''}")
+        return size
+
+    def forget(self, dest):
+        """Drop resume state for a download that will not be retried."""
+        self._validators.pop(dest, None)
+
+    def _transfer(self, path, dest, offset, headers, timeout):
+        """One GET of path into dest. Returns (file size, resumed offset, seconds)."""
+        started = time.time()
+        written = 0
+        with self.session.get(f"{self.base_url}{path}", headers=headers, stream=True,
+                              timeout=(REMOTE_CONNECT_TIMEOUT, timeout)) as response:
+            if response.status_code == 206 and response.headers.get('Content-Range', '').startswith(f"bytes {offset}-"):
+                mode = 'r+b'
+            elif response.status_code == 200:
+                # Full body: the service ignored the range or the file changed
+                offset, mode = 0, 'wb'
+            else:
+                # Start over on the next attempt
+                self._validators.pop(dest, None)
+                raise DownloadError(f"Failed to download processed file: {response.status_code}")
+
+            length = response.headers.get('Content-Length')
+            total = offset + int(length) if length is not None else None
+            self._validators[dest] = response.headers.get('ETag') or response.headers.get('Last-Modified')
+
+            buffer = bytearray(self.chunk_size)
+            view = memoryview(buffer)
+            with open(dest, mode) as f:
+                if total is not None and hasattr(os, 'posix_fallocate'):
+                    # Reserve the whole file up front so it is written contiguously
+                    os.posix_fallocate(f.fileno(), 0, total)
+                f.seek(offset)
+                try:
+                    while True:
+                        n = response.raw.readinto(buffer)
+                        if not n:
+                            break
+                        f.write(view[:n])
+                        written += n
+                        if (offset + written) // REMOTE_PROGRESS_BYTES != (offset + written - n) // REMOTE_PROGRESS_BYTES:
+                            elapsed = time.time() - started
+                            logger.info(f"Downloaded {(offset + written) / (1024 * 1024):.1f} MB of {dest} "
+                                        f"({written / (1024 * 1024 * max(elapsed, 1e-6)):.1f} MB/s)")
+                except Exception as e:
+                    raise DownloadError(f"Download of {path} interrupted after {offset + written} bytes: {e}") from e
+                finally:
+                    # Drop preallocated space past the last byte received
+                    f.truncate(offset + written)
+                    elapsed = time.time() - started
+                    with self._lock:
+                        self.bytes_downloaded += written
+                        self.seconds_downloading += elapsed
+                        if mode == 'r+b':
+                            self.resumes += 1
+                            self.bytes_resumed += offset
+                        if written and elapsed > 0:
+                            self.last_rate = written / elapsed
+
+        if total is not None and offset + written != total:
+            raise DownloadError(f"Download of {path} ended after {offset + written} of {total} bytes")
+        return offset + written, (offset if mode == 'r+b' else 0), elapsed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'downloads': self.downloads,
+                'failures': self.failures,
+                'resumes': self.resumes,
+                'bytes_downloaded': self.bytes_downloaded,
+                'bytes_resumed': self.bytes_resumed,
+                'mean_mb_per_s': (self.bytes_downloaded / (1024 * 1024) / self.seconds_downloading
+                                  if self.seconds_downloading else None),
+                'last_mb_per_s': self.last_rate / (1024 * 1024) if self.last_rate else None,
+                'chunk_size': self.chunk_size
+            }
@@ -0,0 +1,255 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Written last into every published entry
+MANIFEST_NAME = "manifest.json"
+# Work-in-progress runs are written here, then renamed into place
+STAGING_DIR = ".staging"
+# Subdirectory of an entry holding map tiles rendered on demand (tiles.TILE_DIR)
+TILE_DIR = "tiles"
+# Evict least recently used entries once the cache grows past this size
+RESULT_CACHE_MAX_BYTES = 50 * 1024 ** 3
+# Evict entries nobody has requested for this long
+RESULT_CACHE_MAX_AGE_DAYS = 90
+# Never evict entries requested more recently than this
+RESULT_CACHE_MIN_AGE_SECONDS = 3600
+# Record a read of an entry at most this often
+RESULT_CACHE_TOUCH_SECONDS = 600
+
+
+def dir_size(path):
+    """Total size in bytes of the files under path."""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+class ResultCache:
+    """Durable cache of rendered model outputs, one folder per lake and valid time.
+
+    Each entry is data/<YYYYMMDD_HHl>/ with a manifest recording the lake,
+    valid time and model version that produced it. A lookup only hits when
+    the manifest version matches, so new weights or pipeline changes are
+    recomputed while historical cases are served straight from disk.
+
+    An entry's last access is the modification time of its manifest (of
+    the folder, for entries without one). Lookups and touch(), called when
+    the entry's files are read, move it forward; eviction and the age limit
+    go by it.
+
+    on_publish(fname) and on_remove(fname) are called after an
+    entry appears or disappears, so indexes can follow without rescanning.
+    """
+
+    def __init__(self, root, max_bytes=RESULT_CACHE_MAX_BYTES, max_age_days=RESULT_CACHE_MAX_AGE_DAYS,
+                 on_publish=None, on_remove=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.on_publish = on_publish
+        self.on_remove = on_remove
+        self._lock = threading.Lock()
+        # time.time() of the last read recorded by touch(), per entry
+        self._touched = {}
+        self.hits = 0
+        self.misses = 0
+        self.published = 0
+        self.evicted = 0
+
+    def entry_dir(self, fname):
+        return os.path.join(self.root, fname)
+
+    def read_manifest(self, fname):
+        """Return the manifest for fname, or None if the entry is missing or incomplete."""
+        try:
+            with open(os.path.join(self.entry_dir(fname), MANIFEST_NAME), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, NotADirectoryError, ValueError):
+            return None
+
+    def lookup(self, fname, version):
+        """Return the manifest if a result for fname was produced by version."""
+        manifest = self.read_manifest(fname)
+        with self._lock:
+            if manifest is None or manifest.get('version') != version:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        self._record_access(fname)
+        return manifest
+
+    def touch(self, fname):
+        """Record a read of fname's files for eviction, at most once per RESULT_CACHE_TOUCH_SECONDS."""
+        now = time.time()
+        with self._lock:
+            if now - self._touched.get(fname, 0) < RESULT_CACHE_TOUCH_SECONDS:
+                return
+        path = self.entry_dir(fname)
+        if fname.startswith('.') or not os.path.isdir(path):
+            return
+        with self._lock:
+            self._touched[fname] = now
+        self._record_access(fname)
+
+    def _record_access(self, fname):
+        """Move fname's last access time to now."""
+        path = self.entry_dir(fname)
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        try:
+            os.utime(manifest_path if os.path.exists(manifest_path) else path)
+        except OSError:
+            pass
+
+    def staging_dir(self, fname):
+        """Create and return a private directory to build an entry in."""
+        path = os.path.join(self.root, STAGING_DIR, f"{fname}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(path)
+        return path
+
+    def discard(self, staging_path):
+        """Remove a staging directory after a failed run."""
+        shutil.rmtree(staging_path, ignore_errors=True)
+
+    def publish(self, fname, staging_path, lake, valid_time, version, extra=None):
+        """Write the manifest and atomically move a staged entry into place."""
+        files = {}
+        for name in os.listdir(staging_path):
+            path = os.path.join(staging_path, name)
+            if os.path.isfile(path):
+                files[name] = os.path.getsize(path)
+
+        manifest = {
+            'folder': fname,
+            'lake': lake,
+            'valid_time': valid_time,
+            'version': version,
+            'created_at': time.time(),
+            'files': files,
+            'bytes': sum(files.values())
+        }
+        manifest.update(extra or {})
+
+        manifest_tmp = os.path.join(staging_path, MANIFEST_NAME + '.tmp')
+        with open(manifest_tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(manifest_tmp, os.path.join(staging_path, MANIFEST_NAME))
+
+        final_path = self.entry_dir(fname)
+        with self._lock:
+            # Move any superseded entry aside first; directories cannot be replaced in one rename
+            old_path = None
+            if os.path.exists(final_path):
+                old_path = os.path.join(self.root, STAGING_DIR, f"{fname}-old-{uuid.uuid4().hex[:8]}")
+                os.rename(final_path, old_path)
+            os.rename(staging_path, final_path)
+            self.published += 1
+
+        if old_path:
+            shutil.rmtree(old_path, ignore_errors=True)
+        logger.info(f"Published {fname} ({manifest['bytes'] / (1024 * 1024):.1f} MB)")
+        if self.on_publish:
+            self.on_publish(fname)
+        return manifest
+
+    def entries(self):
+        """Return (fname, last_access, bytes) for every entry on disk."""
+        result = []
+        if not os.path.exists(self.root):
+            return result
+
+        for name in os.listdir(self.root):
+            path = self.entry_dir(name)
+            if name == STAGING_DIR or not os.path.isdir(path):
+                continue
+            manifest_path = os.path.join(path, MANIFEST_NAME)
+            manifest = self.read_manifest(name)
+            if manifest is not None:
+                # Map tiles are rendered into the entry after it is published
+                size = manifest.get('bytes', 0) + dir_size(os.path.join(path, TILE_DIR))
+                result.append((name, os.path.getmtime(manifest_path), size))
+            else:
+                # Entries from before the cache existed have no manifest
+                result.append((name, os.path.getmtime(path), dir_size(path)))
+        return result
+
+    def remove(self, fname):
+        """Delete an entry from the cache."""
+        shutil.rmtree(self.entry_dir(fname), ignore_errors=True)
+        with self._lock:
+            self._touched.pop(fname, None)
+            self.evicted += 1
+        logger.info(f"Evicted {fname} from result cache")
+        if self.on_remove:
+            self.on_remove(fname)
+
+    def expire_entry(self, fname):
+        """Remove fname if nobody has requested it for max_age_days.
+
+        Returns the time.time() at which a kept entry next becomes
+        eligible, or None if it was removed or no longer exists.
+        """
+        path = self.entry_dir(fname)
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        try:
+            last_access = os.path.getmtime(manifest_path if os.path.exists(manifest_path) else path)
+        except OSError:
+            return None
+        expires_at = last_access + self.max_age_days * 86400
+        if time.time() < expires_at:
+            return expires_at
+        self.remove(fname)
+        return None
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes."""
+        now = time.time()
+        max_age = self.max_age_days * 86400
+
+        # Staging directories left behind by a crash
+        staging_root = os.path.join(self.root, STAGING_DIR)
+        if os.path.exists(staging_root):
+            for name in os.listdir(staging_root):
+                path = os.path.join(staging_root, name)
+                if now - os.path.getmtime(path) > 86400:
+                    shutil.rmtree(path, ignore_errors=True)
+
+        kept = []
+        for fname, last_access, size in self.entries():
+            if now - last_access > max_age:
+                self.remove(fname)
+            else:
+                kept.append((fname, last_access, size))
+
+        total = sum(size for _, _, size in kept)
+        for fname, last_access, size in sorted(kept, key=lambda entry: entry[1]):
+            if total <= self.max_bytes:
+                break
+            if now - last_access < RESULT_CACHE_MIN_AGE_SECONDS:
+                continue
+            self.remove(fname)
+            total -= size
+        return total
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'published': self.published,
+                'evicted': self.evicted,
+                'max_bytes': self.max_bytes,
+                'max_age_days': self.max_age_days
+            }
@@ -1,11 +1,16 @@
 import os
-import shutil
+import hashlib
 import torch
 import xarray as xr
-import requests
 import logging
+import threading
 import time
+from collections import OrderedDict
 from util import nc_to_tensor, ds_to_nc, process_netcdf_to_pngs
+from metrics import verification_metrics
+from static_delivery import precompress_dir
+from splits_index import split_index
+from remote_client import RemoteClient
 from datetime import datetime
 from UNetFormer import UNetFormer
 
@@ -15,6 +20,23 @@ logger = logging.getLogger(__name__)
 
 # X86 service configuration - update with your x86 instance's private IP
 X86_SERVICE_URL = "http://localhost:5001"  # CHANGE THIS to your x86 instance's private IP
+# Pooled keep-alive connections to the x86 service, shared by all download workers
+x86_client = RemoteClient(X86_SERVICE_URL)
+
+# Bump when preprocessing or rendering changes so existing results are not reused
+PIPELINE_VERSION = "5"
+
+# Model weights live in models/<lake>_<variant>.pth
+MODEL_DIR = "models"
+# Number of generators kept resident (4 lakes x A/B variants)
+MODEL_CACHE_SIZE = 8
+# Input channel count for each lake/variant model
+INPUT_NC_LOOKUP = {
+    'erie_A': 9,    'erie_B': 9,
+    'michigan_A': 14, 'michigan_B': 14,
+    'ontario_A': 14, 'ontario_B': 14,
+    'superior_A': 14, 'superior_B': 14,
+}
 
 
 def load_generator(model_path, input_nc, output_nc=1, device="cpu"):
@@ -33,77 +55,268 @@ def load_generator(model_path, input_nc, output_nc=1, device="cpu"):
     return model
 
 
-def run_lesnet_inference(get_time, lake, device="cpu"):
+class ModelRegistry:
+    """Process-wide LRU cache of eval-mode generators, keyed by model key and device."""
+
+    def __init__(self, max_models=MODEL_CACHE_SIZE):
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def get(self, key, device="cpu"):
+        """Return a ready-to-run model for key (e.g. 'erie_A'), loading it on a miss."""
+        if key not in INPUT_NC_LOOKUP:
+            raise ValueError(f"No model config for key: {key}")
+
+        cache_key = (key, str(device))
+        with self._lock:
+            model = self._models.get(cache_key)
+            if model is not None:
+                self._models.move_to_end(cache_key)
+                self.hits += 1
+                return model
+            self.misses += 1
+            load_lock = self._load_locks.setdefault(cache_key, threading.Lock())
+
+        # Only one thread loads a given model; the others wait and reuse it
+        with load_lock:
+            with self._lock:
+                model = self._models.get(cache_key)
+                if model is not None:
+                    self._models.move_to_end(cache_key)
+                    return model
+
+            started = time.time()
+            model = load_generator(
+                os.path.join(MODEL_DIR, f"{key}.pth"),
+                input_nc=INPUT_NC_LOOKUP[key],
+                device=device
+            )
+            elapsed = time.time() - started
+            logger.info(f"Loaded model {key} on {device} in {elapsed:.2f}s")
+
+            with self._lock:
+                self._models[cache_key] = model
+                self.loads += 1
+                self.load_seconds += elapsed
+                while len(self._models) > self.max_models:
+                    evicted, _ = self._models.popitem(last=False)
+                    self.evictions += 1
+                    logger.info(f"Evicted model {evicted[0]} from registry")
+        return model
+
+    def warm_up(self, keys=None, device="cpu"):
+        """Load models ahead of the first request; failures are logged, not raised."""
+        for key in (keys or list(INPUT_NC_LOOKUP)[:self.max_models]):
+            try:
+                self.get(key, device=device)
+            except Exception as e:
+                logger.error(f"Failed to warm up model {key}: {str(e)}")
+
+    def stats(self):
+        """Return hit/miss/load counters for monitoring."""
+        with self._lock:
+            return {
+                'resident': [key for key, _ in self._models],
+                'max_models': self.max_models,
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'load_seconds': round(self.load_seconds, 3)
+            }
+
+
+# Shared by every queue worker in this process
+model_registry = ModelRegistry()
+
+
+# SHA-256 of each weights file, keyed by (path, size, mtime)
+_weights_hashes = {}
+
+
+def model_version(lake):
+    """Short hash identifying the weights and pipeline that produce a lake's output."""
+    digest = hashlib.sha256(PIPELINE_VERSION.encode())
+    for variant in ("A", "B"):
+        path = os.path.join(MODEL_DIR, f"{lake.lower()}_{variant}.pth")
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            digest.update(b"missing")
+            continue
+
+        signature = (path, st.st_size, st.st_mtime_ns)
+        file_hash = _weights_hashes.get(signature)
+        if file_hash is None:
+            file_digest = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    file_digest.update(chunk)
+            file_hash = _weights_hashes[signature] = file_digest.hexdigest()
+        digest.update(file_hash.encode())
+    return digest.hexdigest()[:12]
+
+
+def check_missing(fname, lake):
+    """Raise ValueError if the date/lake combination is in the missing list."""
+    if split_index.is_missing(fname): raise ValueError(f"The requested date ({fname}) has missing data for {lake} and cannot be processed.")
+
+
+def prepare_input(get_time, lake, out_dir=None):
+    """Fetch the model input for one run from the x86 service.
+
+    Args:
+        get_time: ISO timestamp of the valid time
+        lake: Lake name (e.g., 'erie')
+        out_dir: Directory to write into, defaults to ./data/<fname>
+
+    Returns:
+        (fname, netcdf_path) for the downloaded input file
+    """
     os.environ['REMAP_EXTRAPOLATE'] = 'off'
     get_time = datetime.fromisoformat(get_time.replace("Z", "+00:00"))
     fname = get_time.strftime('%Y%m%d_%H') + lake[0]
+    check_missing(fname, lake)
 
-    # Check if date/lake combination is in the missing list
     try:
-        with open("./splits/missing.txt", "r") as f: missing_dates = [line.strip() for line in f.readlines()]
-        if fname in missing_dates: raise ValueError(f"The requested date ({fname}) has missing data for {lake} and cannot be processed.")
-    except FileNotFoundError: pass
-
-    try:
-        netcdf_path = f"./data/{fname}/{fname}_in.nc"
-        output_path = f"./data/{fname}/out.nc"
-        remote_process_day(get_time, lake[0], fname)
+        remote_process_day(get_time, lake[0], fname, out_dir=out_dir)
+    except Exception as e:
+        raise RuntimeError(f"Runtime error for {fname}: {str(e)}. Please wait 5 seconds, refresh the page, and try again.") from e
+    return fname, os.path.join(out_dir or f"./data/{fname}", f"{fname}_in.nc")
 
-        model_keys = [f"{lake.lower()}_A", f"{lake.lower()}_B"]
-        input_nc_lookup = {
-            'erie_A': 9,    'erie_B': 9,
-            'michigan_A': 14, 'michigan_B': 14,
-            'ontario_A': 14, 'ontario_B': 14,
-            'superior_A': 14, 'superior_B': 14,
-        }
 
-        results = []
+def infer_batch(lake, netcdf_paths, device="cpu"):
+    """Run the A and B models over a batch of inputs for one lake.
 
-        for key in model_keys:
-            if key not in input_nc_lookup:
-                raise ValueError(f"No model config for key: {key}")
+    Each input file is read once and stacked into a single [N, C, H, W]
+    tensor that goes through each model in one forward pass.
 
-            input_nc = input_nc_lookup[key]
-            model_path = os.path.join("models", f"{key}.pth")
+    Returns:
+        List of (LESNet-A, LESNet-B) numpy arrays, one pair per input path
+    """
+    lake = lake.lower()
+    input_nc = INPUT_NC_LOOKUP.get(f"{lake}_A")
+    if input_nc is None or INPUT_NC_LOOKUP.get(f"{lake}_B") != input_nc:
+        raise ValueError(f"No model config for lake: {lake}")
 
-            # Load and preprocess input
-            input_tensor = nc_to_tensor(netcdf_path, input_nc)
-            input_tensor = input_tensor.unsqueeze(0)  # Add batch dim
+    batch = torch.stack([nc_to_tensor(path, input_nc) for path in netcdf_paths], dim=0)
 
-            # Load model
-            model = load_generator(model_path, input_nc=input_nc, device=device)
+    outputs = []
+    with torch.no_grad():
+        for variant in ("A", "B"):
+            model = model_registry.get(f"{lake}_{variant}", device=device)
+            outputs.append(model(batch.to(device))[:, 0].cpu().numpy())  # Shape: [N, H, W]
 
-            # Run model
-            with torch.no_grad():
-                output_tensor = model(input_tensor.to(device))[0, 0].cpu()  # Shape: [H, W]
+    return [(outputs[0][i], outputs[1][i]) for i in range(len(netcdf_paths))]
 
-            results.append(output_tensor)
 
+def merge_outputs(fname, lake, lesnet_a, lesnet_b, out_dir=None):
+    """Merge model output with its inputs into out.nc and drop the input file."""
+    out_dir = out_dir or f"./data/{fname}"
+    netcdf_path = os.path.join(out_dir, f"{fname}_in.nc")
+    try:
         # Convert to xarray.Dataset for named access
         ds = xr.Dataset({
-            'LESNet-A': (('y', 'x'), results[0].numpy()),
-            'LESNet-B': (('y', 'x'), results[1].numpy())
+            'LESNet-A': (('y', 'x'), lesnet_a),
+            'LESNet-B': (('y', 'x'), lesnet_b)
         })
 
-        ds_to_nc(ds, netcdf_path, output_path, lake)
+        ds_to_nc(ds, netcdf_path, os.path.join(out_dir, "out.nc"), lake)
         os.remove(netcdf_path)
         print(f"Inference complete for {fname}.")
-        process_netcdf_to_pngs(output_path, f"./data/{fname}/")
-        print(f"Rendering complete for {fname}.")
+    except Exception as e:
+        raise RuntimeError(f"Runtime error for {fname}: {str(e)}. Please wait 5 seconds, refresh the page, and try again.") from e
 
+
+def render_outputs(fname, out_dir=None):
+    """Render the map products for a merged out.nc and return its verification metrics."""
+    out_dir = out_dir or f"./data/{fname}"
+    try:
+        process_netcdf_to_pngs(os.path.join(out_dir, "out.nc"), out_dir)
+        # Compressed copies of the text and value products, published with them
+        precompress_dir(out_dir)
+        print(f"Rendering complete for {fname}.")
+        return verification_metrics(out_dir)
     except Exception as e:
         raise RuntimeError(f"Runtime error for {fname}: {str(e)}. Please wait 5 seconds, refresh the page, and try again.") from e
-        shutil.rmtree(f"./data/original/{fname}/", ignore_errors=True)
-        shutil.rmtree(f"./data/{fname}/", ignore_errors=True)
 
 
-def remote_process_day(date, lake, fname=None):
+def infer_to_netcdf(lake, jobs, device="cpu"):
+    """Run the models over a batch of downloaded inputs and write each out.nc.
+
+    This is the inference stage of the queue pipeline. It runs in a worker
+    thread or in a worker process from the pool.
+
+    Args:
+        lake: Lake name (e.g., 'erie')
+        jobs: List of (fname, out_dir) pairs whose inputs are already downloaded
+        device: Torch device to run the models on
+
+    Returns:
+        List with an error message for each failed job and None for each success
+    """
+    errors = [None] * len(jobs)
+    run_started = time.time()
+    try:
+        outputs = infer_batch(lake, [os.path.join(out_dir, f"{fname}_in.nc") for fname, out_dir in jobs], device=device)
+    except Exception as e:
+        return [f"Runtime error for {fname}: {str(e)}. Please wait 5 seconds, refresh the page, and try again."
+                for fname, _ in jobs]
+    logger.info(f"Batched inference for {len(jobs)} input(s) on {lake} took {time.time() - run_started:.2f}s")
+
+    for i, ((fname, out_dir), (lesnet_a, lesnet_b)) in enumerate(zip(jobs, outputs)):
+        try:
+            merge_outputs(fname, lake, lesnet_a, lesnet_b, out_dir=out_dir)
+        except Exception as e:
+            errors[i] = str(e)
+    return errors
+
+
+# Shared by a pool's worker processes; their start-up tasks meet here
+_worker_barrier = None
+
+
+def init_worker_process(num_threads, warm_up=True, barrier=None):
+    """Initializer for pool worker processes: split cores and optionally load models."""
+    global _worker_barrier
+    _worker_barrier = barrier
+    torch.set_num_threads(num_threads)
+    logger.info(f"Worker process {os.getpid()} using {num_threads} torch threads")
+    if warm_up:
+        model_registry.warm_up()
+
+
+def worker_process_state(wait_for_all=False):
+    """Identify this worker process and report its model registry.
+
+    With wait_for_all, return only once every worker of the pool is running
+    this too, so one call per worker reaches each of them exactly once.
+    """
+    if wait_for_all and _worker_barrier is not None:
+        _worker_barrier.wait()
+    return {'pid': os.getpid(), 'models': model_registry.stats()}
+
+
+def run_in_worker(func, *args):
+    """Run a stage function in a pool worker; returns (result, worker_process_state())."""
+    return func(*args), worker_process_state()
+
+
+def remote_process_day(date, lake, fname=None, out_dir=None):
     """Call the x86 service to process data instead of running locally
 
     Args:
         date: Datetime object for the data to process
         lake: Lake identifier (e.g., 'e', 'm', 'o', 's')
         fname: Optional directory name, will be generated if not provided
+        out_dir: Optional destination directory, defaults to ./data/<fname>
 
     Returns:
         dirname: Name of the directory where processed data is stored
@@ -114,55 +327,27 @@ def remote_process_day(date, lake, fname=None):
     logger.info(f"Requesting data processing for {date.isoformat()} lake={lake}")
 
     # Prepare destination directory
-    os.makedirs(f"./data/{fname}", exist_ok=True)
+    out_dir = out_dir or f"./data/{fname}"
+    os.makedirs(out_dir, exist_ok=True)
 
     # Call the process endpoint
     retries = 3
     retry_delay = 5  # seconds
+    file_path = os.path.join(out_dir, f"{fname}_in.nc")
+    dirname = None
 
     for attempt in range(retries):
         try:
-            # Start the remote processing
-            response = requests.post(
-                f"{X86_SERVICE_URL}/process",
-                json={'date': date.isoformat(), 'lake': lake},
-                timeout=30  # Initial request timeout
-            )
-
-            if response.status_code != 200:
-                error_msg = response.json().get('error', 'Unknown error')
-                raise Exception(f"Remote processing failed: {error_msg}")
-
-            result = response.json()
-            logger.info(f"Processing request successful, downloading result for {fname}")
-
-            # Download the processed file with streaming and progress tracking
-            download_response = requests.get(
-                f"{X86_SERVICE_URL}/download/{result['dirname']}",
-                stream=True,
-                timeout=300  # Longer timeout for download
-            )
-
-            if download_response.status_code != 200:
-                raise Exception(f"Failed to download processed file: {download_response.status_code}")
-
-            # Save the file
-            file_path = f"./data/{fname}/{fname}_in.nc"
-            with open(file_path, 'wb') as f:
-                downloaded = 0
-                chunk_size = 8192  # 8KB chunks
-                start_time = time.time()
-
-                for chunk in download_response.iter_content(chunk_size=chunk_size):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
+            # Start the remote processing; a retry after a failed download reuses its result
+            if dirname is None:
+                result = x86_client.post_json("/process", {'date': date.isoformat(), 'lake': lake},
+                                              timeout=30)  # Initial request timeout
+                dirname = result['dirname']
+                logger.info(f"Processing request successful, downloading result for {fname}")
 
-                        # Log progress for large files
-                        if downloaded > 10 * 1024 * 1024 and downloaded % (50 * 1024 * 1024) < chunk_size:  # Every 50MB
-                            elapsed = time.time() - start_time
-                            speed = downloaded / (1024 * 1024 * elapsed) if elapsed > 0 else 0
-                            logger.info(f"Downloaded {downloaded/(1024*1024):.1f} MB in {elapsed:.1f}s ({speed:.1f} MB/s)")
+            # Continues from the bytes already on disk when retried
+            x86_client.download(f"/download/{dirname}", file_path,
+                                timeout=300)  # Longer timeout for download
 
             logger.info(f"Successfully downloaded {file_path}")
             return fname
@@ -175,4 +360,5 @@ def remote_process_day(date, lake, fname=None):
                 retry_delay *= 2  # Exponential backoff
             else:
                 logger.error("All retry attempts failed")
+                x86_client.forget(file_path)
                 raise Exception(f"Failed to process data remotely after {retries} attempts: {str(e)}")
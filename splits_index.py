@@ -0,0 +1,139 @@
+import os
+import csv
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+from catalog import LAKE_NAMES, parse_folder
+
+# Directory holding missing.txt and the per-lake <l>_split.csv files
+SPLITS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'splits')
+# One YYYYMMDD_HHl folder name per line for inputs that cannot be processed
+MISSING_NAME = "missing.txt"
+# Split columns in the CSVs; a date listed under several keeps the first
+SPLIT_NAMES = ("train", "val", "test")
+
+
+def parse_split_date(text):
+    """Return 'YYYY-MM-DD' for an MM/DD/YYYY (or MM/DD/YY) cell, or None."""
+    parts = text.strip().split('/')
+    if len(parts) != 3:
+        return None
+    try:
+        month, day, year = (int(part) for part in parts)
+        if year < 100:
+            year += 2000
+        return datetime(year, month, day).strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def read_split_csv(path):
+    """Return {date: split} for one lake's split CSV."""
+    dates = {}
+    with open(path, 'r', newline='') as f:
+        rows = list(csv.DictReader(f))
+    for split in SPLIT_NAMES:
+        for row in rows:
+            date = parse_split_date(row.get(split) or '')
+            if date is not None:
+                dates.setdefault(date, split)
+    return dates
+
+
+class SplitIndex:
+    """In-memory view of splits/: missing inputs and per-lake split calendars.
+
+    Files are parsed once and re-read only when their modification time
+    changes, so validation and the calendar API never parse per request.
+    Calendar payloads are serialized at load time together with an ETag.
+    """
+
+    def __init__(self, root=SPLITS_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._signature = None
+        self.missing = frozenset()
+        self._dates = {}
+        self._calendars = {}
+
+    def _paths(self):
+        paths = {None: os.path.join(self.root, MISSING_NAME)}
+        for initial in LAKE_NAMES:
+            paths[initial] = os.path.join(self.root, f"{initial}_split.csv")
+        return paths
+
+    def _stat_signature(self, paths):
+        signature = []
+        for key, path in paths.items():
+            try:
+                st = os.stat(path)
+                signature.append((key, st.st_ino, st.st_size, st.st_mtime_ns))
+            except OSError:
+                signature.append((key, None))
+        return tuple(signature)
+
+    def refresh(self):
+        """Reload any file changed since the last call."""
+        paths = self._paths()
+        signature = self._stat_signature(paths)
+        with self._lock:
+            if signature == self._signature:
+                return
+            self._load(paths)
+            self._signature = signature
+
+    def _load(self, paths):
+        try:
+            with open(paths[None], 'r') as f:
+                missing = frozenset(line.strip() for line in f if line.strip())
+        except FileNotFoundError:
+            missing = frozenset()
+
+        # Valid times of missing inputs, grouped by lake
+        missing_times = {}
+        for folder in missing:
+            parsed = parse_folder(folder)
+            if parsed is not None:
+                missing_times.setdefault(folder[11], []).append(parsed[0].strftime('%Y-%m-%d %H:00'))
+
+        lake_dates = {}
+        calendars = {}
+        for initial, name in LAKE_NAMES.items():
+            try:
+                dates = lake_dates[initial] = read_split_csv(paths[initial])
+            except FileNotFoundError:
+                continue
+            payload = {
+                "lake": name,
+                "dates": dates,
+                "missing": sorted(missing_times.get(initial, []))
+            }
+            for split in SPLIT_NAMES:
+                payload[split] = sorted(date for date, s in dates.items() if s == split)
+            body = json.dumps(payload, separators=(',', ':')).encode()
+            calendars[initial] = (body, hashlib.sha1(body).hexdigest()[:16])
+
+        self.missing = missing
+        self._dates = lake_dates
+        self._calendars = calendars
+
+    def is_missing(self, fname):
+        """True if the YYYYMMDD_HHl folder name is listed in missing.txt."""
+        self.refresh()
+        return fname in self.missing
+
+    def dates(self, lake, split):
+        """Return the 'YYYY-MM-DD' dates of a lake name or initial in one split, newest first."""
+        self.refresh()
+        dates = self._dates.get(lake[:1].lower(), {}) if lake else {}
+        return sorted((date for date, s in dates.items() if s == split), reverse=True)
+
+    def calendar(self, lake):
+        """Return (JSON body, ETag) for a lake name or initial, or None if unknown."""
+        self.refresh()
+        return self._calendars.get(lake[:1].lower()) if lake else None
+
+
+split_index = SplitIndex()
@@ -11,7 +11,7 @@ let fp = null;
 let fpInitialized = false;
 let creditsVisible = false;
 let activeModelRunId = null;
-let modelStatusCheckInterval = null;
+let modelStatusStream = null; // EventSource for the active run, if any
 
 // Check if flatpickr is available in the global scope
 if (typeof flatpickr === "undefined") {
@@ -88,10 +88,19 @@ document.addEventListener("DOMContentLoaded", () => {
     ],
   };
 
+  // Deepest zoom the server renders tiles for (tiles.TILE_MAX_ZOOM)
+  const TILE_MAX_ZOOM = 10;
+
   // Current folder and data
   let currentFolder = null;
   let currentMetadata = null;
-  let allValueData = {}; // Store variable values for display
+  let currentMetrics = Promise.resolve(null); // Verification scores from /metrics
+  // Per-panel cursor value requests ({ inFlight, pending, hovering })
+  const valueRequests = [0, 1, 2, 3].map(() => ({
+    inFlight: false,
+    pending: null,
+    hovering: false,
+  }));
 
   // Initialize maps
   const maps = [];
@@ -206,6 +215,9 @@ document.addEventListener("DOMContentLoaded", () => {
           crosshair.style.display = "none";
         }
         document.getElementById(`value-display${j + 1}`).textContent = "";
+        // Ignore value answers still in flight
+        valueRequests[j].pending = null;
+        valueRequests[j].hovering = false;
       }
       // Hide floating lat/lon label
       const floatLabel = document.getElementById("latlon-float");
@@ -351,12 +363,7 @@ document.addEventListener("DOMContentLoaded", () => {
       return;
     }
 
-    // Use first letter of lake name for the file name
-    const lakeKey = lake.charAt(0);
-
-    console.log(
-      `Loading calendar data for lake: ${lake} using key: ${lakeKey}`,
-    );
+    console.log(`Loading calendar data for lake: ${lake}`);
 
     // Enable date input and update placeholder
     const dateInput = document.getElementById("date-input");
@@ -374,20 +381,19 @@ document.addEventListener("DOMContentLoaded", () => {
 
     // Date input already enabled in the function beginning
 
-    fetch(`/splits/${lakeKey}_split.csv`)
+    // The server parses the split CSV once and serves it as JSON
+    fetch(`/calendar/${encodeURIComponent(lake)}`)
       .then((response) => {
         if (!response.ok) {
           throw new Error(`HTTP error! Status: ${response.status}`);
         }
-        return response.text();
+        return response.json();
       })
-      .then((csvText) => {
-        const data = parseCSVData(csvText);
+      .then((data) => {
         calendarData[lake] = data;
 
-        // Check if data was successfully parsed
         if (!data.train.length && !data.val.length && !data.test.length) {
-          console.warn("No valid dates found in CSV for lake:", lake);
+          console.warn("No valid dates found in calendar for lake:", lake);
         }
 
         initializeCalendar(lake, data);
@@ -400,7 +406,7 @@ document.addEventListener("DOMContentLoaded", () => {
       .catch((error) => {
         console.error(`Error loading calendar data: ${error}`);
         // Initialize with empty data if fetch fails
-        initializeCalendar(lake, { train: [], val: [], test: [] });
+        initializeCalendar(lake, { train: [], val: [], test: [], dates: {} });
 
         if (dateInput) {
           dateInput.placeholder = "Error loading calendar data";
@@ -408,90 +414,6 @@ document.addEventListener("DOMContentLoaded", () => {
       });
   }
 
-  /**
-   * Parse CSV data from text
-   */
-  function parseCSVData(csvText) {
-    if (!csvText) {
-      console.error("Empty CSV text provided to parseCSVData");
-      return { train: [], val: [], test: [] };
-    }
-
-    console.log("Parsing CSV data");
-
-    try {
-      const lines = csvText.trim().split("\n");
-      if (lines.length === 0) {
-        console.error("No lines found in CSV data");
-        return { train: [], val: [], test: [] };
-      }
-
-      const headers = lines[0].split(",");
-      const result = {
-        train: [],
-        val: [],
-        test: [],
-      };
-
-      console.log(`Found ${lines.length} lines in CSV with headers:`, headers);
-
-      // Skip header row
-      for (let i = 1; i < lines.length; i++) {
-        const columns = lines[i].split(",");
-        headers.forEach((header, index) => {
-          const headerKey = header.trim();
-          if (headerKey in result && columns[index] && columns[index].trim()) {
-            const dateParts = columns[index].trim().split("/");
-            if (dateParts.length === 3) {
-              try {
-                const month = parseInt(dateParts[0], 10);
-                const day = parseInt(dateParts[1], 10);
-                let year = parseInt(dateParts[2], 10);
-
-                // Ensure 4-digit year
-                if (year < 100) {
-                  year += 2000;
-                }
-
-                // Validate date components
-                if (
-                  month < 1 ||
-                  month > 12 ||
-                  day < 1 ||
-                  day > 31 ||
-                  isNaN(year)
-                ) {
-                  console.warn(
-                    `Invalid date at line ${i + 1}, column ${index + 1}: ${columns[index].trim()}`,
-                  );
-                  return;
-                }
-
-                const dateStr = `${year}-${month.toString().padStart(2, "0")}-${day.toString().padStart(2, "0")}`;
-                result[headerKey].push(dateStr);
-              } catch (e) {
-                console.error(
-                  `Error parsing date at line ${i + 1}, column ${index + 1}:`,
-                  e,
-                );
-              }
-            } else {
-              console.warn(
-                `Invalid date format at line ${i + 1}, column ${index + 1}: ${columns[index].trim()}`,
-              );
-            }
-          }
-        });
-      }
-
-      console.log("Parsed CSV data:", result);
-      return result;
-    } catch (e) {
-      console.error("Error parsing CSV data:", e);
-      return { train: [], val: [], test: [] };
-    }
-  }
-
   /**
    * Initialize calendar with lake-specific data
    */
@@ -559,12 +481,9 @@ document.addEventListener("DOMContentLoaded", () => {
           `${date.getFullYear()}-` +
           `${String(date.getMonth() + 1).padStart(2, "0")}-` +
           `${String(date.getDate()).padStart(2, "0")}`;
-        if (data.train.includes(formatted)) {
-          dayElem.classList.add("train-date");
-        } else if (data.val.includes(formatted)) {
-          dayElem.classList.add("val-date");
-        } else if (data.test.includes(formatted)) {
-          dayElem.classList.add("test-date");
+        const split = data.dates && data.dates[formatted];
+        if (split) {
+          dayElem.classList.add(`${split}-date`);
         }
       },
       // Update field when a day is picked
@@ -686,10 +605,8 @@ document.addEventListener("DOMContentLoaded", () => {
       return;
     }
 
-    // Ensure we have valid data arrays
-    const trainDates = data && data.train ? data.train : [];
-    const valDates = data && data.val ? data.val : [];
-    const testDates = data && data.test ? data.test : [];
+    // Date -> split lookup from the calendar API
+    const splitDates = data && data.dates ? data.dates : {};
 
     // Get all day elements in the calendar
     const days = instance.calendarContainer.querySelectorAll(".flatpickr-day");
@@ -716,12 +633,9 @@ document.addEventListener("DOMContentLoaded", () => {
             const formattedDate = `${date.getFullYear()}-${(date.getMonth() + 1).toString().padStart(2, "0")}-${date.getDate().toString().padStart(2, "0")}`;
 
             // Add appropriate class based on which dataset contains this date
-            if (trainDates.includes(formattedDate)) {
-              dayElement.classList.add("train-date");
-            } else if (valDates.includes(formattedDate)) {
-              dayElement.classList.add("val-date");
-            } else if (testDates.includes(formattedDate)) {
-              dayElement.classList.add("test-date");
+            const split = splitDates[formattedDate];
+            if (split) {
+              dayElement.classList.add(`${split}-date`);
             }
           } catch (e) {
             // Silently skip invalid dates
@@ -735,6 +649,12 @@ document.addEventListener("DOMContentLoaded", () => {
    * Get units for a variable
    */
   function getVariableUnits(variableName) {
+    // Units from the folder's metadata index when the server provides them
+    const layer = currentMetadata && currentMetadata[variableName];
+    if (layer && typeof layer.units === "string") {
+      return layer.units;
+    }
+
     const unitMap = {
       QPE_hrrr: "mm",
       QPE_past: "mm",
@@ -786,7 +706,7 @@ document.addEventListener("DOMContentLoaded", () => {
     const layerName = selectElement.value;
     const layer = currentMetadata[layerName];
 
-    if (!layer || !layer.georeferencing || !allValueData[layerName]) {
+    if (!layer || !layer.georeferencing) {
       displayElement.textContent = "";
       return;
     }
@@ -800,59 +720,94 @@ document.addEventListener("DOMContentLoaded", () => {
       return;
     }
 
-    // Calculate grid indices
-    const height = allValueData[layerName].length;
-    const width = allValueData[layerName][0].length;
-
-    const latRange = lats[3] - lats[0];
-    const lonRange = lons[1] - lons[0];
-
-    const latNorm = (latlng.lat - lats[0]) / latRange;
-    const lonNorm = (latlng.lng - lons[0]) / lonRange;
+    // Skip the request when the cursor is outside the grid
+    const latNorm = (latlng.lat - lats[0]) / (lats[3] - lats[0]);
+    const lonNorm = (latlng.lng - lons[0]) / (lons[1] - lons[0]);
 
     if (latNorm < 0 || latNorm > 1 || lonNorm < 0 || lonNorm > 1) {
+      valueRequests[mapIndex].pending = null;
       displayElement.textContent = "";
       return;
     }
 
-    // Convert to grid indices
-    const rowIndex = Math.min(Math.floor(latNorm * height), height - 1);
-    const colIndex = Math.min(Math.floor(lonNorm * width), width - 1);
+    requestValue(mapIndex, currentFolder, layerName, latlng);
+  }
 
-    // Get and format the value
-    try {
-      const value = allValueData[layerName][rowIndex][colIndex];
-      const formattedValue =
-        typeof value === "number"
-          ? value === 0
-            ? "0.00"
-            : Math.abs(value) < 0.01
-              ? value.toExponential(2)
-              : value.toFixed(2)
-          : "N/A";
-
-      // Get units for the variable
-      const units = getVariableUnits(layerName);
-
-      // Format the display text with units but without variable name
-      displayElement.textContent = units
-        ? `${formattedValue} ${units}`
-        : formattedValue;
-    } catch (e) {
-      displayElement.textContent = "";
-    }
+  /**
+   * Fetch a value from the server, keeping at most one request in flight per
+   * panel and only the most recent cursor position queued behind it
+   */
+  function requestValue(mapIndex, folder, layerName, latlng) {
+    const state = valueRequests[mapIndex];
+    state.pending = { folder, layerName, latlng };
+    state.hovering = true;
+    if (state.inFlight) return;
+
+    const { pending } = state;
+    state.pending = null;
+    state.inFlight = true;
+
+    fetch(
+      `/value/${pending.folder}/${pending.layerName}?lat=${pending.latlng.lat}&lon=${pending.latlng.lng}`,
+    )
+      .then((response) => response.json())
+      .then((data) => {
+        const displayElement = document.getElementById(
+          `value-display${mapIndex + 1}`,
+        );
+        const selectElement = document.getElementById(
+          `panel${mapIndex + 1}-select`,
+        );
+        // Drop stale answers for a layer or folder that is no longer shown
+        if (
+          state.pending ||
+          !state.hovering ||
+          pending.folder !== currentFolder ||
+          !selectElement ||
+          selectElement.value !== pending.layerName
+        ) {
+          return;
+        }
+
+        const value = data.value;
+        const formattedValue =
+          typeof value === "number"
+            ? value === 0
+              ? "0.00"
+              : Math.abs(value) < 0.01
+                ? value.toExponential(2)
+                : value.toFixed(2)
+            : "N/A";
+
+        // Get units for the variable
+        const units = getVariableUnits(pending.layerName);
+
+        // Format the display text with units but without variable name
+        displayElement.textContent = units
+          ? `${formattedValue} ${units}`
+          : formattedValue;
+      })
+      .catch(() => {})
+      .finally(() => {
+        state.inFlight = false;
+        if (state.pending) {
+          const next = state.pending;
+          requestValue(mapIndex, next.folder, next.layerName, next.latlng);
+        }
+      });
   }
 
+
   /**
    * Show a notification that the model run was added to queue
    */
-  function showQueueNotification() {
+  function showQueueNotification(maxRuns = 1) {
     const notification = document.createElement("div");
     notification.className = "queue-notification";
     notification.innerHTML = `
       <div class="queue-notification-content">
         <p>Model run added to queue!</p>
-        <p>Only 1 model run can execute at a time.</p>
+        <p>Only ${maxRuns} model run${maxRuns === 1 ? "" : "s"} can execute at a time.</p>
         <p>Your request will be processed automatically.</p>
         <p class="small">Please don't refresh the page.</p>
       </div>
@@ -877,13 +832,67 @@ document.addEventListener("DOMContentLoaded", () => {
    * Load available datasets
    */
   /**
-   * Check the status of a model run
-   * @param {string} runId - The ID of the model run to check
+   * Follow a model run's status as the server pushes changes, using
+   * Server-Sent Events with long polling as the fallback
+   * @param {string} runId - The ID of the model run to follow
    */
-  function checkModelStatus(runId) {
+  function watchModelStatus(runId) {
+    stopWatchingModelStatus();
     if (!runId) return;
 
-    fetch(`/model_status/${runId}`)
+    if (!window.EventSource) {
+      longPollModelStatus(runId, "");
+      return;
+    }
+
+    const stream = new EventSource(`/model_status/${runId}/stream`);
+    modelStatusStream = stream;
+    stream.onmessage = (event) => {
+      const data = JSON.parse(event.data);
+      if (data.status === "completed" || data.status === "error") {
+        stream.close();
+      }
+      handleModelStatus(runId, data);
+    };
+    stream.addEventListener("gone", () => {
+      // Status expired on the server; there is nothing left to follow
+      stream.close();
+      modelStatusStream = null;
+      if (runId === activeModelRunId) {
+        abandonModelRun(
+          "The status of this model run is no longer available. Please check the available data or run the model again.",
+        );
+      }
+    });
+    stream.onerror = () => {
+      // Stream unsupported or dropped (e.g. by a proxy); switch to long polling
+      stream.close();
+      if (modelStatusStream === stream && runId === activeModelRunId) {
+        modelStatusStream = null;
+        longPollModelStatus(runId, "");
+      }
+    };
+  }
+
+  /**
+   * Stop following the active run's status
+   */
+  function stopWatchingModelStatus() {
+    if (modelStatusStream) {
+      modelStatusStream.close();
+      modelStatusStream = null;
+    }
+  }
+
+  /**
+   * Ask for the run's status, held open by the server until it changes
+   * @param {string} runId - The ID of the model run to check
+   * @param {string} since - ETag of the last status seen
+   */
+  function longPollModelStatus(runId, since) {
+    if (!runId || runId !== activeModelRunId) return;
+
+    fetch(`/model_status/${runId}?wait=25&since=${since}`)
       .then((response) => {
         if (!response.ok) {
           throw new Error("Status check failed");
@@ -891,120 +900,163 @@ document.addEventListener("DOMContentLoaded", () => {
         return response.json();
       })
       .then((data) => {
-        // If this isn't the active run anymore, stop checking
-        if (runId !== activeModelRunId) {
-          return;
-        }
-
-        const loadingIndicator = document.getElementById("loading-indicator");
-        const queueStatus = document.getElementById("queue-status");
-        const queuePosition = document.getElementById("queue-position");
-        const runButton = document.getElementById("run-button");
-        const errorMessage = document.getElementById("error-message");
-        const progressContainer = document.getElementById("progress-container");
-        const progressStatus = document.getElementById("progress-status");
-
-        // Reset consecutive failures counter on successful response
-        window.statusCheckFailures = 0;
-
-        if (data.status === "queued") {
-          // Still in queue
-          loadingIndicator.classList.remove("hidden");
-          loadingIndicator.querySelector("p").textContent =
-            "Waiting in queue... Please wait.";
-          queueStatus.classList.remove("hidden");
-          queuePosition.textContent = data.queue_position + 1;
-          runButton.disabled = true;
-          errorMessage.classList.add("hidden");
-
-          // Update progress
-          progressContainer.classList.remove("hidden");
-          progressStatus.textContent = "Waiting in queue...";
-        } else if (data.status === "processing") {
-          // Processing
-          loadingIndicator.classList.remove("hidden");
-          loadingIndicator.querySelector("p").textContent =
-            "Running model... This may take a few minutes.";
-          queueStatus.classList.add("hidden");
-          runButton.disabled = true;
-          errorMessage.classList.add("hidden");
-
-          // Update progress
-          progressContainer.classList.remove("hidden");
-          progressStatus.textContent = "Processing model inference...";
-        } else if (data.status === "completed") {
-          // Completed successfully
-          clearInterval(modelStatusCheckInterval);
-          modelStatusCheckInterval = null;
-          activeModelRunId = null;
-
-          loadingIndicator.classList.add("hidden");
-          queueStatus.classList.add("hidden");
-          progressContainer.classList.add("hidden");
-          runButton.disabled = false;
-          errorMessage.classList.add("hidden");
-
-          // Process the results as before
-          loadAvailableData();
-          setTimeout(() => {
-            loadDataset(data.result.folder_name);
-          }, 1000);
-        } else if (data.status === "error") {
-          // Error occurred
-          clearInterval(modelStatusCheckInterval);
-          modelStatusCheckInterval = null;
-          activeModelRunId = null;
-
-          loadingIndicator.classList.add("hidden");
-          queueStatus.classList.add("hidden");
-          progressContainer.classList.add("hidden");
-          runButton.disabled = false;
-
-          // Show appropriate error
-          if (data.result && data.result.error) {
-            if (data.result.error.includes("missing data")) {
-              showError("Data Issue: " + data.result.error, true);
-            } else {
-              showError(
-                "Model Error: " +
-                  (data.result.error || "An unknown error occurred"),
-              );
-            }
+        handleModelStatus(runId, data);
+        if (data.status !== "completed" && data.status !== "error") {
+          if (data.poll_after) {
+            // The server answered without waiting; ask again after its interval
+            setTimeout(
+              () => longPollModelStatus(runId, data.etag),
+              data.poll_after * 1000,
+            );
           } else {
-            showError("An error occurred while running the model");
+            longPollModelStatus(runId, data.etag);
           }
-        } else {
-          // Unknown status
-          console.warn("Unknown model status:", data.status);
         }
       })
       .catch((error) => {
         console.error("Error checking model status:", error);
-
-        // Count consecutive failures
-        if (!window.statusCheckFailures) {
-          window.statusCheckFailures = 1;
-        } else {
-          window.statusCheckFailures++;
+        if (handleStatusFailure()) {
+          setTimeout(() => longPollModelStatus(runId, since), 3000);
         }
+      });
+  }
 
-        // If too many consecutive failures, stop checking and show error
-        if (window.statusCheckFailures > 3) {
-          clearInterval(modelStatusCheckInterval);
-          modelStatusCheckInterval = null;
-          activeModelRunId = null;
+  /**
+   * Count a failed status check; returns false once the run is given up on
+   */
+  function handleStatusFailure() {
+    // Count consecutive failures
+    if (!window.statusCheckFailures) {
+      window.statusCheckFailures = 1;
+    } else {
+      window.statusCheckFailures++;
+    }
 
-          document.getElementById("loading-indicator").classList.add("hidden");
-          document.getElementById("queue-status").classList.add("hidden");
-          document.getElementById("progress-container").classList.add("hidden");
-          document.getElementById("run-button").disabled = false;
+    // If too many consecutive failures, stop checking and show error
+    if (window.statusCheckFailures > 3) {
+      abandonModelRun(
+        "Connection Error: The server is not responding. Your request may still be processing. Please wait a moment and try again later.",
+      );
+      return false;
+    }
+    return true;
+  }
+
+  /**
+   * Stop following the active run, reset the run controls and show why
+   * @param {string} message - Error shown to the user
+   */
+  function abandonModelRun(message) {
+    stopWatchingModelStatus();
+    activeModelRunId = null;
+
+    document.getElementById("loading-indicator").classList.add("hidden");
+    document.getElementById("queue-status").classList.add("hidden");
+    document.getElementById("progress-container").classList.add("hidden");
+    document.getElementById("run-button").disabled = false;
+
+    showError(message);
+    window.statusCheckFailures = 0;
+  }
 
+  /**
+   * Update the UI for a model run status
+   * @param {string} runId - The ID of the model run
+   * @param {Object} data - Status payload from the server
+   */
+  function handleModelStatus(runId, data) {
+    // If this isn't the active run anymore, ignore it
+    if (runId !== activeModelRunId) {
+      return;
+    }
+
+    const loadingIndicator = document.getElementById("loading-indicator");
+    const queueStatus = document.getElementById("queue-status");
+    const queuePosition = document.getElementById("queue-position");
+    const runButton = document.getElementById("run-button");
+    const errorMessage = document.getElementById("error-message");
+    const progressContainer = document.getElementById("progress-container");
+    const progressStatus = document.getElementById("progress-status");
+
+    // Reset consecutive failures counter on successful response
+    window.statusCheckFailures = 0;
+
+    if (data.status === "queued") {
+      // Still in queue
+      loadingIndicator.classList.remove("hidden");
+      loadingIndicator.querySelector("p").textContent =
+        "Waiting in queue... Please wait.";
+      queueStatus.classList.remove("hidden");
+      queuePosition.textContent = data.queue_position + 1;
+      runButton.disabled = true;
+      errorMessage.classList.add("hidden");
+
+      // Update progress
+      progressContainer.classList.remove("hidden");
+      progressStatus.textContent = "Waiting in queue...";
+    } else if (data.status === "processing") {
+      // Processing
+      loadingIndicator.classList.remove("hidden");
+      loadingIndicator.querySelector("p").textContent =
+        "Running model... This may take a few minutes.";
+      queueStatus.classList.add("hidden");
+      runButton.disabled = true;
+      errorMessage.classList.add("hidden");
+
+      // Update progress with the pipeline stage
+      const stageLabels = {
+        downloading: "Downloading model inputs...",
+        "waiting for inference": "Waiting for inference...",
+        inference: "Processing model inference...",
+        "waiting for render": "Waiting to render maps...",
+        rendering: "Rendering maps...",
+      };
+      progressContainer.classList.remove("hidden");
+      progressStatus.textContent =
+        stageLabels[data.stage] || "Processing model inference...";
+    } else if (data.status === "completed") {
+      // Completed successfully
+      stopWatchingModelStatus();
+      activeModelRunId = null;
+
+      loadingIndicator.classList.add("hidden");
+      queueStatus.classList.add("hidden");
+      progressContainer.classList.add("hidden");
+      runButton.disabled = false;
+      errorMessage.classList.add("hidden");
+
+      // Process the results as before
+      loadAvailableData();
+      setTimeout(() => {
+        loadDataset(data.result.folder_name);
+      }, 1000);
+    } else if (data.status === "error") {
+      // Error occurred
+      stopWatchingModelStatus();
+      activeModelRunId = null;
+
+      loadingIndicator.classList.add("hidden");
+      queueStatus.classList.add("hidden");
+      progressContainer.classList.add("hidden");
+      runButton.disabled = false;
+
+      // Show appropriate error
+      if (data.result && data.result.error) {
+        if (data.result.error.includes("missing data")) {
+          showError("Data Issue: " + data.result.error, true);
+        } else {
           showError(
-            "Connection Error: The server is not responding. Your request may still be processing. Please wait a moment and try again later.",
+            "Model Error: " +
+              (data.result.error || "An unknown error occurred"),
           );
-          window.statusCheckFailures = 0;
         }
-      });
+      } else {
+        showError("An error occurred while running the model");
+      }
+    } else {
+      // Unknown status
+      console.warn("Unknown model status:", data.status);
+    }
   }
 
   function loadAvailableData() {
@@ -1073,11 +1125,8 @@ document.addEventListener("DOMContentLoaded", () => {
       return;
     }
 
-    // Clear any existing interval
-    if (modelStatusCheckInterval) {
-      clearInterval(modelStatusCheckInterval);
-      modelStatusCheckInterval = null;
-    }
+    // Stop following any previous run
+    stopWatchingModelStatus();
 
     // Initialize UI for model submission
     document.getElementById("loading-indicator").classList.remove("hidden");
@@ -1122,6 +1171,16 @@ document.addEventListener("DOMContentLoaded", () => {
       })
       .then((data) => {
         if (data.success) {
+          // Finished result already on the server - show it right away
+          if (data.status === "completed") {
+            document.getElementById("loading-indicator").classList.add("hidden");
+            document.getElementById("progress-container").classList.add("hidden");
+            document.getElementById("run-button").disabled = false;
+            loadAvailableData();
+            loadDataset(data.result.folder_name);
+            return;
+          }
+
           // Store the run ID for status checking
           activeModelRunId = data.run_id;
 
@@ -1142,7 +1201,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
             // Show notification about being in queue
             if (data.queue_position > 0) {
-              showQueueNotification();
+              showQueueNotification(data.max_runs);
             }
           } else {
             // Likely processing immediately
@@ -1155,13 +1214,8 @@ document.addEventListener("DOMContentLoaded", () => {
               "Processing";
           }
 
-          // Start checking status with a slightly longer interval
-          modelStatusCheckInterval = setInterval(() => {
-            checkModelStatus(activeModelRunId);
-          }, 3000);
-
-          // Also check immediately
-          checkModelStatus(activeModelRunId);
+          // Follow status changes pushed by the server
+          watchModelStatus(activeModelRunId);
         } else {
           // Handle immediate error
           document.getElementById("loading-indicator").classList.add("hidden");
@@ -1189,7 +1243,11 @@ document.addEventListener("DOMContentLoaded", () => {
    */
   function loadDataset(folder) {
     currentFolder = folder;
-    allValueData = {}; // Reset stored values
+
+    // Verification scores are computed by the server at render time
+    currentMetrics = fetch(`/metrics/${folder}`)
+      .then((response) => (response.ok ? response.json() : null))
+      .catch(() => null);
 
     // Highlight selected item
     const dataItems = document.querySelectorAll(".data-item");
@@ -1327,119 +1385,79 @@ document.addEventListener("DOMContentLoaded", () => {
 
     if (!layerName) return;
 
-    // Add new GeoTIFF overlay and JSON data for value readout
-    const tiffUrl = `/data/${currentFolder}/${layerName}.tif`;
-    const jsonUrl = `/data/${currentFolder}/${layerName}.json`;
-
-    // Load both GeoTIFF and JSON data
-    Promise.all([
-      fetch(tiffUrl).then((response) => response.arrayBuffer()),
-      fetch(jsonUrl).then((response) => response.json()),
-    ])
-      .then(([arrayBuffer, jsonData]) => {
-        // Store the values data for readout
-        if (jsonData.values) {
-          allValueData[layerName] = jsonData.values;
-          currentMetadata[layerName] = jsonData;
-        }
-
-        // Create and add the GeoTIFF layer
-        return parseGeoraster(arrayBuffer).then((georaster) => {
-          mapOverlays[mapIndex] = new GeoRasterLayer({
-            georaster: georaster,
-            opacity: opacity,
-            resolution: 256,
-          }).addTo(maps[mapIndex]);
-
-          // Update panel header
-          const panelHeader = document.querySelector(
-            `.map-panel:nth-child(${mapIndex + 1}) .panel-header`,
-          );
-          if (panelHeader) {
-            panelHeader.textContent = layerName;
-          }
+    // Add server-rendered map tiles, limited to the lake grid when known
+    const tileOptions = {
+      opacity: opacity,
+      maxNativeZoom: TILE_MAX_ZOOM,
+    };
+    const layerMeta = currentMetadata[layerName];
+    if (layerMeta && layerMeta.georeferencing) {
+      const lats = layerMeta.georeferencing.lat;
+      const lons = layerMeta.georeferencing.lon;
+      tileOptions.bounds = [
+        [lats[0], lons[0]],
+        [lats[3], lons[1]],
+      ];
+    }
+    // The metadata URL carries the model version so tiles can be cached
+    const tileUrl =
+      (layerMeta && layerMeta.urls && layerMeta.urls.tiles) ||
+      `/tiles/${currentFolder}/${layerName}/{z}/{x}/{y}.png`;
+    mapOverlays[mapIndex] = L.tileLayer(tileUrl, tileOptions
+    ).addTo(maps[mapIndex]);
+
+    // Update panel header
+    const panelHeader = document.querySelector(
+      `.map-panel:nth-child(${mapIndex + 1}) .panel-header`,
+    );
+    if (panelHeader) {
+      panelHeader.textContent = layerName;
+    }
 
-          // Overlay static colorbar in this panel
-          updateColorbar(mapIndex, layerName);
+    // Overlay static colorbar in this panel
+    updateColorbar(mapIndex, layerName);
 
-          // Calculate and display MAE
-          calculateMAE(mapIndex, layerName);
-          // Also update the colorbar for this panel
-          updateColorbar(mapIndex, layerName);
-        });
-      })
-      .catch((error) => {
-        console.error("Error loading layer:", error);
-        showError(`Failed to load layer ${layerName}`);
-      });
+    // Display verification scores for forecast layers
+    showMetrics(mapIndex, layerName);
   }
 
   /**
-   * Calculate Mean Absolute Error between a layer and QPE_target
+   * Show the server-computed scores of a layer against QPE_target
    * @param {number} mapIndex - Index of the map panel
-   * @param {string} layerName - Name of the layer to compare with QPE_target
+   * @param {string} layerName - Layer shown in the panel
    */
-  function calculateMAE(mapIndex, layerName) {
-    // Skip calculation if no data
-    if (!allValueData || !allValueData["QPE_target"]) {
-      // Remove any existing MAE display
-      removeMAEDisplay(mapIndex);
-      return;
-    }
-
-    // Get data for the current layer and target
-    const layerData = allValueData[layerName];
-    const targetData = allValueData["QPE_target"];
-
-    if (!layerData || !targetData) {
-      // Data not loaded yet
-      removeMAEDisplay(mapIndex);
-      return;
-    }
-
-    try {
-      // Calculate MAE
-      let totalError = 0;
-      let validPoints = 0;
-
-      // Both arrays should have the same dimensions
-      for (let i = 0; i < layerData.length; i++) {
-        for (let j = 0; j < layerData[i].length; j++) {
-          // Only consider points where both values are valid (not null/undefined/NaN)
-          const layerValue = layerData[i][j];
-          const targetValue = targetData[i][j];
+  function showMetrics(mapIndex, layerName) {
+    const folder = currentFolder;
+    removeMAEDisplay(mapIndex);
 
-          if (
-            layerValue !== null &&
-            layerValue !== undefined &&
-            targetValue !== null &&
-            targetValue !== undefined &&
-            !isNaN(layerValue) &&
-            !isNaN(targetValue)
-          ) {
-            totalError += Math.abs(layerValue - targetValue);
-            validPoints++;
-          }
-        }
+    currentMetrics.then((metrics) => {
+      const panelSelect = document.getElementById(
+        `panel${mapIndex + 1}-select`,
+      );
+      // Skip answers for a layer or folder that is no longer shown
+      if (
+        folder !== currentFolder ||
+        !panelSelect ||
+        panelSelect.value !== layerName
+      ) {
+        return;
       }
 
-      // Calculate final MAE
-      let mae = validPoints > 0 ? totalError / validPoints : 0;
-
-      // Display MAE
-      displayMAE(mapIndex, mae);
-    } catch (error) {
-      console.error("Error calculating MAE:", error);
-      removeMAEDisplay(mapIndex);
-    }
+      const scores = metrics && metrics.forecasts[layerName];
+      if (scores) {
+        displayMAE(mapIndex, scores);
+      } else {
+        removeMAEDisplay(mapIndex);
+      }
+    });
   }
 
   /**
    * Display MAE value in the map panel
    * @param {number} mapIndex - Index of the map panel
-   * @param {number} mae - Mean Absolute Error value
+   * @param {Object} scores - Scores for the layer from /metrics
    */
-  function displayMAE(mapIndex, mae) {
+  function displayMAE(mapIndex, scores) {
     // Remove any existing MAE display
     removeMAEDisplay(mapIndex);
 
@@ -1454,7 +1472,16 @@ document.addEventListener("DOMContentLoaded", () => {
     maeDisplay.id = `mae-display-${mapIndex}`;
 
     // Round to 4 decimal places
-    maeDisplay.textContent = `MAE: ${mae.toFixed(4)}`;
+    maeDisplay.textContent = `MAE: ${scores.mae.toFixed(4)}`;
+
+    // Remaining scores on hover
+    const csi = Object.entries(scores.thresholds)
+      .map(
+        ([threshold, s]) =>
+          `CSI ≥${threshold} mm: ${s.csi === null ? "N/A" : s.csi.toFixed(3)}`,
+      )
+      .join("\n");
+    maeDisplay.title = `Bias: ${scores.bias.toFixed(4)}\nRMSE: ${scores.rmse.toFixed(4)}\n${csi}`;
 
     // Add to map panel
     mapPanel.appendChild(maeDisplay);
@@ -0,0 +1,107 @@
+import os
+import gzip
+import mimetypes
+
+from flask import current_app, request, send_file, abort
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip is always available
+    brotli = None
+
+# Text and value products worth storing precompressed
+PRECOMPRESS_EXTENSIONS = ('.json', '.csv', '.bin')
+# Only keep a compressed variant that saves at least this fraction of the file
+PRECOMPRESS_MIN_SAVING = 0.1
+# Cache-Control for versioned URLs whose content never changes
+IMMUTABLE_CACHE_CONTROL = f"public, max-age={365 * 86400}, immutable"
+# Hand the file transfer to the front proxy: '' (Flask sends it), 'x-sendfile'
+# (Apache/lighttpd) or 'x-accel' (nginx)
+SENDFILE_MODE = os.environ.get('LESWEB_SENDFILE', '')
+# nginx internal location aliased to this application's directory
+X_ACCEL_PREFIX = os.environ.get('LESWEB_X_ACCEL_PREFIX', '/internal')
+
+# Content-Encoding -> (file suffix, compressor), in order of preference
+ENCODINGS = {}
+if brotli is not None:
+    ENCODINGS['br'] = ('.br', lambda data: brotli.compress(data, quality=5))
+ENCODINGS['gzip'] = ('.gz', lambda data: gzip.compress(data, compresslevel=6, mtime=0))
+
+mimetypes.add_type('application/octet-stream', '.bin')
+
+
+def precompress_file(path):
+    """Write path.br / path.gz next to path when they are meaningfully smaller."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    for suffix, compress in ENCODINGS.values():
+        encoded = compress(data)
+        if len(encoded) <= len(data) * (1 - PRECOMPRESS_MIN_SAVING):
+            tmp_path = f"{path}{suffix}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(encoded)
+            os.replace(tmp_path, path + suffix)
+
+
+def precompress_dir(directory, extensions=PRECOMPRESS_EXTENSIONS):
+    """Precompress every matching file directly inside directory."""
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith(extensions) and os.path.isfile(path):
+            precompress_file(path)
+
+
+def choose_encoding(path):
+    """Return (content encoding, file to send) for the current request."""
+    # Byte ranges always address the identity representation
+    if 'Range' in request.headers:
+        return None, path
+
+    mtime = os.path.getmtime(path)
+    for encoding, (suffix, _) in ENCODINGS.items():
+        if request.accept_encodings[encoding] <= 0:
+            continue
+        variant = path + suffix
+        try:
+            if os.path.getmtime(variant) >= mtime:
+                return encoding, variant
+        except OSError:
+            continue
+    return None, path
+
+
+def send_static(directory, filename, cache_control='no-cache'):
+    """Send a file with strong ETags, Range support and the best stored encoding.
+
+    Files are assumed to be replaced atomically, never edited in place, so
+    the inode, size and mtime identify their content.
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    encoding, send_path = choose_encoding(path)
+    st = os.stat(send_path)
+    etag = f"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    if SENDFILE_MODE == 'x-accel':
+        # nginx serves the body and handles Range; answer revalidation here
+        response = current_app.response_class(mimetype=mimetype)
+        response.set_etag(etag)
+        if request.if_none_match.contains(etag):
+            response.status_code = 304
+        else:
+            relative = os.path.relpath(send_path, current_app.root_path)
+            response.headers['X-Accel-Redirect'] = f"{X_ACCEL_PREFIX}/{relative}"
+    else:
+        # send_file emits X-Sendfile itself when USE_X_SENDFILE is set
+        response = send_file(send_path, mimetype=mimetype, conditional=True, etag=etag, max_age=None)
+
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if filename.endswith(PRECOMPRESS_EXTENSIONS):
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control
+    return response
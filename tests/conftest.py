@@ -0,0 +1,13 @@
+import os
+import sys
+
+# The app is a flat set of modules in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests that import app get a private job store and no precompute or download
+# workers, so nothing claims the runs a test queues; no model warm-up either,
+# which would still be loading when the interpreter exits
+os.environ.setdefault('LESWEB_JOB_DB', ':memory:')
+os.environ.setdefault('LESWEB_PRECOMPUTE', '0')
+os.environ.setdefault('LESWEB_DOWNLOAD_WORKERS', '0')
+os.environ.setdefault('LESWEB_WARM_UP', '0')
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import util
+
+# Raw-unit offsets around each colour bin edge, to land on both sides of it
+EDGE_STEPS = (-2, -1, 0, 1, 2)
+
+
+def legacy_colorize(varname, arr):
+    """The matplotlib rendering colorize() replaced."""
+    values = np.nan_to_num(util.preprocess_variables(varname, arr.astype(np.float32).copy()))
+    mapper, _ = util.get_cmap(varname)
+    return values, mapper.to_rgba(values, bytes=True)[..., :3].transpose(2, 0, 1)
+
+
+def raw_values(varname, values):
+    """Invert the arithmetic preprocessing steps, so values map back to raw units."""
+    raw = np.asarray(values, dtype=np.float64)
+    inverse = {np.multiply: np.divide, np.divide: np.multiply, np.add: np.subtract, np.subtract: np.add}
+    for op, operand in reversed(util.preprocess_steps(varname)):
+        if op in inverse:
+            raw = inverse[op](raw, operand)
+    return raw
+
+
+def edge_grid(varname):
+    """A grid of raw values on and around every bin edge, plus NaN and ±inf."""
+    spec = util.RENDER_SPECS[varname]
+    edges = raw_values(varname, spec.boundaries).astype(np.float32)
+    thresholds = [operand for op, operand in spec.steps if isinstance(op, str)]
+    cells = [np.float32(0), np.nan, np.inf, -np.inf]
+    for edge in np.concatenate([edges, raw_values(varname, thresholds).astype(np.float32),
+                                -raw_values(varname, thresholds).astype(np.float32)]):
+        for step in EDGE_STEPS:
+            value = edge
+            for _ in range(abs(step)):
+                value = np.nextafter(value, np.float32(np.inf if step > 0 else -np.inf))
+            cells.append(value)
+    cells += [edges[0] - 1000, edges[-1] + 1000]
+    cells = np.array(cells, dtype=np.float32)
+    # Odd width so rows do not line up with the edge pattern
+    width = 7
+    return np.resize(cells, (-(-cells.size // width), width))
+
+
+@pytest.mark.parametrize("varname", util.RENDERED_VARIABLES)
+def test_colorize_matches_matplotlib(varname):
+    assert util.RENDER_SPECS[varname] is not None
+    grid = edge_grid(varname)
+    values, rgb = util.colorize(varname, grid)
+    expected_values, expected_rgb = legacy_colorize(varname, grid)
+    assert values.dtype == np.float32
+    np.testing.assert_array_equal(values, expected_values)
+    np.testing.assert_array_equal(rgb, expected_rgb)
+
+
+@pytest.mark.parametrize("varname", util.RENDERED_VARIABLES)
+def test_lookup_table_at_exact_edges(varname):
+    spec = util.RENDER_SPECS[varname]
+    mapper, _ = util.get_cmap(varname)
+    values = np.concatenate([spec.boundaries, [spec.boundaries[0] - 1, spec.boundaries[-1] + 1]])
+    expected = mapper.to_rgba(values, bytes=True)[:, :3].T
+    np.testing.assert_array_equal(spec.lut[:, np.searchsorted(spec.boundaries, values, side='right')], expected)
+
+
+def test_colorize_does_not_modify_input():
+    grid = edge_grid("TMP_surface")
+    before = grid.copy()
+    util.colorize("TMP_surface", grid)
+    np.testing.assert_array_equal(grid, before)
@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import expiry
+import job_store
+import result_cache as result_cache_module
+from expiry import ExpiryScheduler
+from job_store import SQLiteJobStore
+from result_cache import ResultCache, MANIFEST_NAME
+
+DAY = 86400
+
+
+class FakeClock:
+    """Stands in for the time module; starts at the real clock and only moves when advanced."""
+
+    def __init__(self):
+        self.wall = time.time()
+        self.mono = time.monotonic()
+
+    def time(self):
+        return self.wall
+
+    def monotonic(self):
+        return self.mono
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(expiry, 'time', fake)
+    monkeypatch.setattr(job_store, 'time', fake)
+    monkeypatch.setattr(result_cache_module, 'time', fake)
+    return fake
+
+
+@pytest.fixture
+def scheduler(clock):
+    scheduler = ExpiryScheduler()
+    scheduler.start()
+    return scheduler
+
+
+def advance(scheduler, clock, seconds):
+    """Move the clock on and wait until every callback due by then has run."""
+    with scheduler._cond:
+        clock.wall += seconds
+        clock.mono += seconds
+        scheduler._cond.notify_all()
+    # Deadlines run in order, so once this one has run everything due before it has too
+    done = threading.Event()
+    scheduler.schedule(('test', 'settled'), 0, done.set)
+    assert done.wait(5)
+
+
+def test_callbacks_run_at_their_deadlines_in_order(scheduler, clock):
+    ran = []
+    for name, delay in [('a', 30), ('b', 10), ('c', 20)]:
+        scheduler.schedule(('status', name), delay, lambda name=name: ran.append(name))
+
+    advance(scheduler, clock, 15)
+    assert ran == ['b']
+    advance(scheduler, clock, 10)
+    assert ran == ['b', 'c']
+    advance(scheduler, clock, 10)
+    assert ran == ['b', 'c', 'a']
+    assert scheduler.stats()['expired_by_kind']['status'] == 3
+    assert scheduler.stats()['live'] == 0
+
+
+def test_reschedule_replaces_the_deadline_and_cancel_drops_it(scheduler, clock):
+    ran = []
+    scheduler.schedule(('status', 'x'), 10, lambda: ran.append('x'))
+    scheduler.schedule(('status', 'x'), 50, lambda: ran.append('x again'))
+    scheduler.schedule(('status', 'y'), 10, lambda: ran.append('y'))
+    assert scheduler.cancel(('status', 'y'))
+    assert not scheduler.cancel(('status', 'y'))
+
+    advance(scheduler, clock, 20)
+    assert ran == []
+    advance(scheduler, clock, 40)
+    assert ran == ['x again']
+
+
+def test_every_repeats_until_cancelled_and_survives_errors(scheduler, clock):
+    calls = []
+
+    def sweep():
+        calls.append(clock.monotonic())
+        if len(calls) == 1:
+            raise RuntimeError('first sweep fails')
+
+    scheduler.every(('jobs', 'stale'), 60, sweep)
+    advance(scheduler, clock, 30)
+    assert calls == []
+    advance(scheduler, clock, 30)
+    advance(scheduler, clock, 60)
+    assert len(calls) == 2
+    assert scheduler.stats()['errors'] == 1
+
+    scheduler.cancel(('jobs', 'stale'))
+    advance(scheduler, clock, 120)
+    assert len(calls) == 2
+
+
+def test_expire_removes_old_finished_and_stale_runs(clock):
+    store = SQLiteJobStore(':memory:')
+    start = clock.wall
+
+    def run_at(name, submitted, finished=None):
+        clock.wall = start + submitted
+        run_id, _ = store.submit('erie', '2024-01-01 23:00', f"erie/{name}")
+        if finished is not None:
+            clock.wall = start + finished
+            store.finish([run_id], 'completed', {})
+        return run_id
+
+    old_finished = run_at('old_finished', 1.5 * DAY, 2 * DAY)
+    recent_finished = run_at('recent_finished', 3.5 * DAY, 3.5 * DAY)
+    stale_queued = run_at('stale_queued', 0.5 * DAY)
+    recent_queued = run_at('recent_queued', 2 * DAY)
+
+    assert store.expire(finished_before=start + 3 * DAY, submitted_before=start + DAY) == 2
+    assert store.get(old_finished) is None
+    assert store.get(stale_queued) is None
+    assert store.get(recent_finished)['status'] == 'completed'
+    assert store.get(recent_queued)['status'] == 'queued'
+
+
+@pytest.fixture
+def app_with_clock(monkeypatch, tmp_path, scheduler):
+    """app with its own job store, result cache and expiry scheduler on the fake clock."""
+    import app
+    store = SQLiteJobStore(':memory:')
+    monkeypatch.setattr(app, 'job_store', store)
+    monkeypatch.setattr(app, 'expiry', scheduler)
+    monkeypatch.setattr(app, 'result_cache', ResultCache(str(tmp_path), max_age_days=1))
+    return app
+
+
+def test_finished_run_status_is_deleted_after_its_ttl(app_with_clock, clock):
+    app = app_with_clock
+    run_id, _ = app.job_store.submit('erie', '2024-01-01 23:00', 'erie/1')
+    app.job_store.finish([run_id], 'completed', {})
+    app.schedule_status_cleanup(run_id)
+
+    advance(app.expiry, clock, app.STATUS_TTL_SECONDS - 1)
+    assert app.job_store.get(run_id) is not None
+    advance(app.expiry, clock, 1)
+    assert app.job_store.get(run_id) is None
+
+
+def test_stale_runs_are_reaped(app_with_clock, clock):
+    app = app_with_clock
+    # app reads the real clock, so date the runs back instead
+    clock.wall = time.time() - 4 * DAY
+    stale, _ = app.job_store.submit('erie', '2024-01-01 23:00', 'erie/stale')
+    clock.wall = time.time() - 2 * DAY
+    finished, _ = app.job_store.submit('erie', '2024-01-02 23:00', 'erie/finished')
+    app.job_store.finish([finished], 'completed', {})
+    recent, _ = app.job_store.submit('erie', '2024-01-03 23:00', 'erie/recent')
+
+    app.reap_stale_runs()
+    assert app.job_store.get(stale) is None
+    assert app.job_store.get(finished) is None
+    assert app.job_store.get(recent)['status'] == 'queued'
+
+
+def write_entry(cache, fname, age):
+    path = cache.entry_dir(fname)
+    os.makedirs(path)
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    with open(manifest_path, 'w') as f:
+        json.dump({'bytes': 0}, f)
+    last_access = time.time() - age
+    os.utime(manifest_path, (last_access, last_access))
+
+
+def test_retention_is_rescheduled_for_entries_found_at_startup(app_with_clock, clock):
+    app = app_with_clock
+    cache = app.result_cache
+    write_entry(cache, '20240101_23e', age=2 * DAY)
+    write_entry(cache, '20240102_23e', age=DAY / 2)
+
+    # What startup does after a restart has lost every pending deadline
+    for fname, _, _ in cache.entries():
+        app.schedule_retention(fname)
+    assert cache.read_manifest('20240101_23e') is None
+    assert app.expiry.stats()['live_by_kind'] == {'output': 1}
+
+    advance(app.expiry, clock, DAY / 2 - 60)
+    assert cache.read_manifest('20240102_23e') is not None
+    advance(app.expiry, clock, 120)
+    assert cache.read_manifest('20240102_23e') is None
+    assert app.expiry.stats()['live'] == 0
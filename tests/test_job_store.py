@@ -0,0 +1,119 @@
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from job_store import SQLiteJobStore, process_owner
+
+# Runs queued for the concurrent claim test
+CLAIM_RUNS = 40
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'jobs.sqlite3')
+
+
+def dead_owner():
+    """host:pid:token of a process on this host that has exited."""
+    child = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                           capture_output=True, text=True, check=True)
+    return f"{socket.gethostname()}:{child.stdout.strip()}:deadbeef"
+
+
+def submit(store, n, **kwargs):
+    return [store.submit('erie', f"2024-01-{day:02d} 23:00", f"erie/{day}", **kwargs)[0]
+            for day in range(1, n + 1)]
+
+
+def test_concurrent_claims_from_two_stores_take_each_run_once(db_path):
+    stores = [SQLiteJobStore(db_path), SQLiteJobStore(db_path)]
+    run_ids = submit(stores[0], CLAIM_RUNS)
+    claimed = []
+    lock = threading.Lock()
+
+    def claim(store, owner):
+        while True:
+            run = store.claim_next(owner)
+            if run is None:
+                return
+            with lock:
+                claimed.append(run['run_id'])
+
+    threads = [threading.Thread(target=claim, args=(store, f"{socket.gethostname()}:1:{i}"))
+               for i, store in enumerate(stores * 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(run_ids)
+    assert stores[1].counts() == {'processing': CLAIM_RUNS}
+
+
+def test_second_store_claims_the_next_run(db_path):
+    first, second = SQLiteJobStore(db_path), SQLiteJobStore(db_path)
+    run_ids = submit(first, 2)
+    assert first.claim_next('a')['run_id'] == run_ids[0]
+    assert second.claim_next('b')['run_id'] == run_ids[1]
+    assert second.claim_next('b') is None
+    assert first.get(run_ids[0])['owner'] == 'a'
+
+
+def test_requeue_orphans_takes_back_runs_of_dead_owners(db_path):
+    store = SQLiteJobStore(db_path)
+    owner = process_owner()
+    host, pid, _ = owner.split(':')
+    dead, restarted, remote = submit(store, 3)
+    store.claim_next(dead_owner())
+    # Same pid as this process but an earlier token: a predecessor this process replaced
+    store.claim_next(f"{host}:{pid}:0ld70ken")
+    # Processes on other hosts cannot be checked and are left alone
+    store.claim_next('elsewhere:1:abcd1234')
+    mine, _ = store.submit('erie', '2024-02-01 23:00', 'erie/mine')
+    store.claim_next(owner)
+
+    assert store.requeue_orphans(owner) == 2
+    for run_id in (dead, restarted):
+        run = store.get(run_id)
+        assert run['status'] == 'queued'
+        assert run['owner'] is None and run['stage'] is None
+    assert store.get(remote)['status'] == 'processing'
+    assert store.get(mine)['owner'] == owner
+
+    # Requeued runs keep their place and are claimed again
+    assert store.claim_next(owner)['run_id'] == dead
+    assert store.get(dead)['attempts'] == 2
+
+
+def test_version_moves_on_every_change_and_only_then(db_path):
+    store = SQLiteJobStore(db_path)
+    other = SQLiteJobStore(db_path)
+
+    def counter():
+        return other.version()[0]
+
+    seen = [counter()]
+
+    def changed():
+        seen.append(counter())
+        return seen[-1] != seen[-2]
+
+    run_id, _ = store.submit('erie', '2024-01-01 23:00', 'erie/1')
+    assert changed()
+    store.get(run_id)
+    store.counts()
+    assert not changed()
+    store.claim_next('a')
+    assert changed()
+    store.set_stage([run_id], 'inference')
+    assert changed()
+    store.finish([run_id], 'completed', {'success': True})
+    assert changed()
+    # Matches nothing, so nothing was written
+    assert not store.delete_finished('run_999')
+    assert not changed()
+    assert store.delete_finished(run_id)
+    assert changed()
@@ -0,0 +1,138 @@
+import os
+import json
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import run_model
+from remote_client import RemoteClient, DownloadError
+
+# Larger than several read chunks, and not a multiple of one
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 123)
+# Bytes sent by the first download before the connection is cut
+CUT_AFTER = 1024 * 1024 + 7
+CHUNK_SIZE = 64 * 1024
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """The x86 service's /process and /download, cutting the first download short."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers['Content-Length']))
+        server.posts += 1
+        server.peers.add(self.client_address)
+        body = json.dumps({'dirname': 'stand-in'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.gets.append((self.headers.get('Range'), self.headers.get('If-Range')))
+        server.peers.add(self.client_address)
+        start = 0
+        if server.honour_range and self.headers.get('Range') and self.headers.get('If-Range') == server.etag:
+            start = int(self.headers['Range'].split('=')[1].rstrip('-'))
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+        else:
+            self.send_response(200)
+        self.send_header('ETag', server.etag)
+        self.send_header('Content-Length', str(len(PAYLOAD) - start))
+        self.end_headers()
+
+        if len(server.gets) == 1 and server.cut_first:
+            self.wfile.write(PAYLOAD[:CUT_AFTER])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(PAYLOAD[start:])
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    server.posts = 0
+    server.gets = []
+    server.peers = set()
+    server.etag = '"v1"'
+    server.honour_range = True
+    server.cut_first = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_interrupted_download_resumes_with_range(server, tmp_path):
+    client = RemoteClient(server.url, chunk_size=CHUNK_SIZE)
+    dest = str(tmp_path / 'in.nc')
+
+    with pytest.raises(DownloadError):
+        client.download('/download/stand-in', dest, timeout=10)
+    assert read(dest) == PAYLOAD[:CUT_AFTER]
+
+    assert client.download('/download/stand-in', dest, timeout=10) == len(PAYLOAD)
+    assert read(dest) == PAYLOAD
+    assert server.gets == [(None, None), (f"bytes={CUT_AFTER}-", '"v1"')]
+    stats = client.stats()
+    assert stats['resumes'] == 1
+    assert stats['bytes_resumed'] == CUT_AFTER
+    assert stats['bytes_downloaded'] == len(PAYLOAD)
+
+
+@pytest.mark.parametrize("change", ["ignore_range", "new_etag"])
+def test_interrupted_download_restarts_on_full_response(server, tmp_path, change):
+    client = RemoteClient(server.url, chunk_size=CHUNK_SIZE)
+    dest = str(tmp_path / 'in.nc')
+
+    with pytest.raises(DownloadError):
+        client.download('/download/stand-in', dest, timeout=10)
+    if change == "ignore_range":
+        server.honour_range = False
+    else:
+        # A different file now; the stand-in still serves the same bytes
+        server.etag = '"v2"'
+
+    assert client.download('/download/stand-in', dest, timeout=10) == len(PAYLOAD)
+    assert read(dest) == PAYLOAD
+    assert server.gets[1] == (f"bytes={CUT_AFTER}-", '"v1"')
+    assert client.stats()['resumes'] == 0
+
+
+def test_remote_process_day_posts_once_and_reuses_connection(server, tmp_path, monkeypatch):
+    client = RemoteClient(server.url, chunk_size=CHUNK_SIZE)
+    monkeypatch.setattr(run_model, 'x86_client', client)
+    monkeypatch.setattr(run_model.time, 'sleep', lambda seconds: None)
+    date = datetime(2024, 11, 30, 23)
+
+    assert run_model.remote_process_day(date, 'e', 'cut_e', out_dir=str(tmp_path)) == 'cut_e'
+    assert read(tmp_path / 'cut_e_in.nc') == PAYLOAD
+    assert server.posts == 1
+    assert len(server.gets) == 2
+
+    # The cut connection is replaced once, then kept alive across runs
+    server.peers.clear()
+    for i in range(3):
+        run_model.remote_process_day(date, 'e', f"run{i}_e", out_dir=str(tmp_path))
+        assert read(tmp_path / f"run{i}_e_in.nc") == PAYLOAD
+    assert server.posts == 4
+    assert len(server.peers) == 1
@@ -0,0 +1,134 @@
+import types
+
+import pytest
+
+import job_store
+from job_store import SQLiteJobStore, schedule_order, next_promotion
+from result_cache import ResultCache
+
+# Aging period used by these tests, so promotions land at fixed times
+AGING = 600
+
+# Split dates handed to precompute, in the order it should try them
+CANDIDATES = [('erie', f"2024-01-{day:02d} 23:00") for day in range(1, 6)]
+
+
+@pytest.fixture(autouse=True)
+def aging(monkeypatch):
+    monkeypatch.setattr(job_store, 'PRIORITY_AGING_SECONDS', AGING)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable time.time() for the job store."""
+    fake = types.SimpleNamespace(now=0.0)
+    fake.time = lambda: fake.now
+    monkeypatch.setattr(job_store, 'time', fake)
+    return fake
+
+
+def test_schedule_order_ranks_classes_then_rotates_clients():
+    queued = [
+        (1, 'backfill', 'precompute', 0.0),
+        (2, 'interactive', 'a', 10.0),
+        (3, 'interactive', 'a', 20.0),
+        (4, 'prefetch', 'b', 5.0),
+        (5, 'interactive', 'b', 30.0),
+        (6, 'interactive', 'a', 40.0),
+    ]
+    assert schedule_order(queued, {}, now=60.0) == [2, 5, 3, 6, 4, 1]
+    # A run a already has processing counts as its first turn
+    assert schedule_order(queued, {'a': 1}, now=60.0) == [5, 2, 3, 6, 4, 1]
+
+
+def test_backfill_is_promoted_after_two_aging_periods():
+    queued = [(1, 'backfill', None, 0.0), (2, 'interactive', 'a', 1000.0)]
+    assert schedule_order(queued, {}, now=2 * AGING - 1) == [2, 1]
+    assert schedule_order(queued, {}, now=2 * AGING) == [1, 2]
+
+    assert next_promotion(queued, now=0.0) == AGING
+    assert next_promotion(queued, now=AGING + 100) == 2 * AGING
+    assert next_promotion(queued, now=2 * AGING) == float('inf')
+
+
+def test_run_stamped_after_now_keeps_its_class():
+    # Another process may stamp a submission just after this one read the clock
+    queued = [(1, 'interactive', 'a', 100.0), (2, 'prefetch', 'b', 0.0)]
+    assert schedule_order(queued, {}, now=50.0) == [1, 2]
+    assert next_promotion(queued, now=50.0) == AGING
+
+
+def test_store_claims_in_schedule_order(clock):
+    store = SQLiteJobStore(':memory:')
+    submitted = {}
+    for day, client in enumerate(['a', 'a', 'b'], start=1):
+        clock.now = float(day)
+        submitted[client, day] = store.submit('erie', f"2024-01-{day:02d} 23:00", f"erie/{day}", client=client)[0]
+
+    clock.now = 10.0
+    claimed = [store.claim_next('owner')['run_id'] for _ in range(3)]
+    assert claimed == [submitted['a', 1], submitted['b', 3], submitted['a', 2]]
+    assert store.claim_next('owner') is None
+
+
+def test_store_reorders_when_a_backfill_ages_without_a_write(clock):
+    store = SQLiteJobStore(':memory:')
+    backfill, _ = store.submit('erie', '2024-01-01 23:00', 'erie/backfill', priority='backfill')
+    clock.now = 1000.0
+    interactive, _ = store.submit('erie', '2024-01-02 23:00', 'erie/interactive', client='a')
+
+    clock.now = 2 * AGING - 1
+    assert store.get(backfill)['queue_position'] == 1
+    counter, aged = store.version()
+    assert not aged
+
+    clock.now = 2 * AGING
+    assert store.version() == (counter, True)
+    assert store.get(backfill)['queue_position'] == 0
+    assert store.claim_next('owner')['run_id'] == backfill
+
+
+@pytest.fixture
+def precompute(monkeypatch, tmp_path):
+    """app with its own job store and result cache, and precompute limited to CANDIDATES."""
+    import app
+    store = SQLiteJobStore(':memory:')
+    monkeypatch.setattr(app, 'job_store', store)
+    monkeypatch.setattr(app, 'result_cache', ResultCache(str(tmp_path)))
+    monkeypatch.setattr(app, 'model_version', lambda lake: 'v1')
+    monkeypatch.setattr(app, 'precompute_candidates', lambda: iter(CANDIDATES))
+    monkeypatch.setattr(app.split_index, 'is_missing', lambda fname: False)
+    monkeypatch.setattr(app, 'precompute_stats', dict.fromkeys(app.precompute_stats, 0))
+    return app, store
+
+
+def test_precompute_keeps_at_most_max_active_backfill_runs(precompute):
+    app, store = precompute
+    for _ in range(3):
+        app.precompute_split_dates()
+    assert store.active_by_priority() == {'backfill': app.PRECOMPUTE_MAX_ACTIVE}
+    assert app.precompute_stats['submitted'] == app.PRECOMPUTE_MAX_ACTIVE
+
+    # A failed date is skipped, so the next pass moves on to the following one
+    run = store.claim_next('owner')
+    assert run['date'] == CANDIDATES[0][1]
+    store.finish([run['run_id']], 'error', {'error': 'failed'})
+    app.precompute_split_dates()
+    run = store.claim_next('owner')
+    assert run['date'] == CANDIDATES[app.PRECOMPUTE_MAX_ACTIVE][1]
+    assert store.active_by_priority() == {'backfill': app.PRECOMPUTE_MAX_ACTIVE}
+
+
+def test_precompute_waits_for_interactive_runs(precompute):
+    app, store = precompute
+    store.submit('erie', '2024-02-01 23:00', 'erie/interactive', client='a')
+    app.precompute_split_dates()
+    assert store.active_by_priority() == {'interactive': 1}
+
+
+def test_precompute_only_submits_while_holding_the_lease(precompute):
+    app, store = precompute
+    # Owners on other hosts cannot be checked, so their lease is honoured until it expires
+    assert store.acquire_lease(app.PRECOMPUTE_LEASE, 'otherhost:1:cafe', 60)
+    app.precompute_split_dates()
+    assert store.active_by_priority() == {}
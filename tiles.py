@@ -0,0 +1,198 @@
+import io
+import os
+import math
+import uuid
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import xarray as xr
+from PIL import Image
+
+from util import colorize
+
+logger = logging.getLogger(__name__)
+
+# Pixel size of one XYZ tile
+TILE_SIZE = 256
+# Deepest zoom rendered by the server; Leaflet upsamples beyond it
+TILE_MAX_ZOOM = 10
+# Rendered tiles kept in memory, least recently used evicted first
+TILE_MEMORY_CACHE_SIZE = int(os.environ.get('LESWEB_TILE_CACHE_SIZE', 2048))
+# Colourised variable grids kept in memory for rendering new tiles
+TILE_GRID_CACHE_SIZE = 64
+# Tiles are also written under data/<folder>/tiles/<var>/<z>/<x>/<y>.png
+TILE_DIR = "tiles"
+
+# Encoded PNG plus the ETag identifying the out.nc it was rendered from
+Tile = namedtuple('Tile', ['data', 'etag'])
+# Colourised grid for one variable, north-up, with its lat/lon extent
+ColourGrid = namedtuple('ColourGrid', ['rgba', 'west', 'south', 'east', 'north'])
+
+
+def tile_lonlat(z, x, y):
+    """Return the lon of every pixel column and lat of every pixel row centre in an XYZ tile."""
+    offsets = (np.arange(TILE_SIZE, dtype=np.float64) + 0.5) / TILE_SIZE
+    lon = (x + offsets) / (2 ** z) * 360.0 - 180.0
+    n = math.pi - 2.0 * math.pi * (y + offsets) / (2 ** z)
+    lat = np.degrees(np.arctan(np.sinh(n)))
+    return lon, lat
+
+
+def render_tile(grid, z, x, y):
+    """Sample a colourised grid into one RGBA tile with nearest-neighbour lookup.
+
+    Pixel centres are mapped through the same lat/lon transform the GeoTIFFs
+    use, so tiles line up with the Web Mercator products. Returns None if the
+    tile does not touch the grid.
+    """
+    height, width = grid.rgba.shape[:2]
+    lon, lat = tile_lonlat(z, x, y)
+    cols = np.floor((lon - grid.west) / ((grid.east - grid.west) / width)).astype(np.int64)
+    rows = np.floor((grid.north - lat) / ((grid.north - grid.south) / height)).astype(np.int64)
+    col_ok = (cols >= 0) & (cols < width)
+    row_ok = (rows >= 0) & (rows < height)
+    if not col_ok.any() or not row_ok.any():
+        return None
+
+    tile = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+    inside = row_ok[:, None] & col_ok[None, :]
+    tile[inside] = grid.rgba[np.broadcast_to(rows[:, None], inside.shape)[inside],
+                             np.broadcast_to(cols[None, :], inside.shape)[inside]]
+    return tile
+
+
+def encode_png(rgba):
+    buffer = io.BytesIO()
+    Image.fromarray(rgba, mode='RGBA').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+# Served for tiles that do not touch the lake grid
+EMPTY_TILE_PNG = encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+
+
+class TileCache:
+    """XYZ tiles rendered on demand from data/<folder>/out.nc.
+
+    Tiles are looked up in an in-memory LRU, then on disk next to the
+    folder's other products, and only rendered when both miss. Cache keys
+    include the out.nc modification time, so re-running a folder never
+    serves tiles from the previous run.
+    """
+
+    def __init__(self, root, max_tiles=TILE_MEMORY_CACHE_SIZE, max_grids=TILE_GRID_CACHE_SIZE):
+        self.root = root
+        self.max_tiles = max_tiles
+        self.max_grids = max_grids
+        self._tiles = OrderedDict()
+        self._grids = OrderedDict()
+        self._lock = threading.Lock()
+        # netCDF reads are not thread-safe
+        self._load_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.rendered = 0
+
+    def _generation(self, folder):
+        """Identify the current out.nc for folder, or raise FileNotFoundError."""
+        return os.stat(os.path.join(self.root, folder, "out.nc")).st_mtime_ns
+
+    def _grid(self, folder, var, generation):
+        key = (folder, var, generation)
+        with self._lock:
+            grid = self._grids.get(key)
+            if grid is not None:
+                self._grids.move_to_end(key)
+                return grid
+
+        with self._load_lock:
+            with xr.open_dataset(os.path.join(self.root, folder, "out.nc")) as ds:
+                if var not in ds.data_vars:
+                    raise KeyError(var)
+                arr = ds[var].values
+                lats = ds.coords['lat'].values
+                lons = ds.coords['lon'].values
+
+        _, rgb = colorize(var, np.flipud(arr))
+        rgba = np.empty(rgb.shape[1:] + (4,), dtype=np.uint8)
+        rgba[..., :3] = rgb.transpose(1, 2, 0)
+        rgba[..., 3] = 255
+        grid = ColourGrid(rgba, float(lons[0]), float(lats[0]), float(lons[-1]), float(lats[-1]))
+
+        with self._lock:
+            self._grids[key] = grid
+            while len(self._grids) > self.max_grids:
+                self._grids.popitem(last=False)
+        return grid
+
+    def _remember(self, key, tile):
+        with self._lock:
+            self._tiles[key] = tile
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+
+    def get(self, folder, var, z, x, y):
+        """Return the Tile for folder/var at z/x/y; tiles off the grid are transparent.
+
+        Raises FileNotFoundError if folder has no out.nc, KeyError for an
+        unknown variable and ValueError for coordinates outside the pyramid.
+        """
+        if not 0 <= z <= TILE_MAX_ZOOM or not 0 <= x < 2 ** z or not 0 <= y < 2 ** z:
+            raise ValueError(f"Tile {z}/{x}/{y} is outside zoom levels 0-{TILE_MAX_ZOOM}")
+
+        generation = self._generation(folder)
+        etag = f"{generation:x}-{var}-{z}-{x}-{y}"
+        key = (folder, var, z, x, y, generation)
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self.memory_hits += 1
+                return tile
+
+        path = os.path.join(self.root, folder, TILE_DIR, var, str(z), str(x), f"{y}.png")
+        try:
+            if os.path.getmtime(path) * 1e9 >= generation:
+                with open(path, 'rb') as f:
+                    tile = Tile(f.read(), etag)
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, tile)
+                return tile
+        except OSError:
+            pass
+
+        rgba = render_tile(self._grid(folder, var, generation), z, x, y)
+        if rgba is None:
+            tile = Tile(EMPTY_TILE_PNG, etag)
+            self._remember(key, tile)
+            return tile
+        tile = Tile(encode_png(rgba), etag)
+        with self._lock:
+            self.rendered += 1
+
+        # Write via a temporary file so concurrent readers never see a partial tile
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(tile.data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache tile {path}: {e}")
+
+        self._remember(key, tile)
+        return tile
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tiles_in_memory': len(self._tiles),
+                'grids_in_memory': len(self._grids),
+                'max_tiles': self.max_tiles,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'rendered': self.rendered
+            }
@@ -1,6 +1,10 @@
 import os
 import json
 import torch
+import threading
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import colormaps
 import rasterio
 from rasterio.transform import from_bounds
@@ -14,6 +18,35 @@ from PIL import Image
 from matplotlib.cm import ScalarMappable
 import matplotlib.colors as mcolors
 
+# Variables rendered concurrently by process_netcdf_to_pngs
+RENDER_VARIABLE_WORKERS = int(os.environ.get('LESWEB_RENDER_THREADS', min(8, os.cpu_count() or 1)))
+# 'thread' (rasterio and numpy release the GIL) or 'process'
+RENDER_VARIABLE_EXECUTOR = os.environ.get('LESWEB_RENDER_EXECUTOR', 'thread')
+# Also write <var>_4326.tif in the source lat/lon grid (not used by the web app)
+WRITE_4326_TIFF = os.environ.get('LESWEB_WRITE_4326', '0') == '1'
+# GeoTIFF layout: 'cog' (tiled, compressed, internal overviews) or 'gtiff' (plain striped)
+GEOTIFF_FORMAT = os.environ.get('LESWEB_GEOTIFF_FORMAT', 'cog')
+# Compression for COG output: DEFLATE, LZW, ZSTD or NONE
+GEOTIFF_COMPRESS = os.environ.get('LESWEB_GEOTIFF_COMPRESS', 'DEFLATE')
+# COG tile size; overviews are added until the image fits in one tile
+GEOTIFF_BLOCKSIZE = 256
+# Encoding of the <var>.bin value grids: 'float32' (exact) or 'int16' (scaled, half the size)
+VALUE_GRID_DTYPE = os.environ.get('LESWEB_VALUE_DTYPE', 'float32')
+
+
+# Display units of each variable after preprocess_variables
+VARIABLE_UNITS = {
+    "QPE_hrrr": "mm", "QPE_past": "mm", "QPE_target": "mm", "LESNet-A": "mm", "LESNet-B": "mm",
+    "SHSR_mrms": "dBZ", "UGRD_850mb": "kn", "VGRD_850mb": "kn", "UGRD_925mb": "kn", "VGRD_925mb": "kn",
+    "DPT_850mb": "°C", "TMP_850mb": "°C", "DPT_925mb": "°C", "TMP_925mb": "°C",
+    "TMP_surface": "°F", "DPT_2m": "°F", "TMP_masked": "°F", "elev": "m", "landsea": "",
+    "CAPE_surface": "J/kg", "ICEC_surface": "", "THTE_masked": "K", "THTE_850mb": "K",
+    "DIVG_925mb": "1e-5/s", "RELV_925mb": "1e-5/s", "flow": "kn"
+}
+
+# Per-folder list of rendered variables, written once all variables are done
+METADATA_INDEX_NAME = "index.json"
+
 
 def get_cmap(varname):
     """
@@ -98,6 +131,82 @@ def preprocess_variables(varname, var):
     return var
 
 
+# Variables with a compiled render spec; anything else takes the matplotlib path
+RENDERED_VARIABLES = [
+    "QPE_hrrr", "QPE_past", "QPE_target", "LESNet-A", "LESNet-B", "SHSR_mrms",
+    "UGRD_850mb", "VGRD_850mb", "UGRD_925mb", "VGRD_925mb", "DPT_850mb", "DPT_925mb",
+    "TMP_850mb", "TMP_925mb", "DPT_2m", "TMP_surface", "TMP_masked", "THTE_masked",
+    "THTE_850mb", "CAPE_surface", "landsea", "ICEC_surface", "DIVG_925mb", "RELV_925mb",
+    "flow", "elev"
+]
+
+# Compiled colouring for one variable: in-place preprocessing steps, the
+# BoundaryNorm edges, and a [3, len(boundaries) + 1] uint8 RGB colour per bin
+RenderSpec = namedtuple('RenderSpec', ['steps', 'boundaries', 'lut'])
+
+
+def preprocess_steps(varname):
+    """preprocess_variables as a list of in-place (op, operand) steps, in the same order."""
+    steps = []
+    if varname in ["QPE_hrrr", "QPE_past", "QPE_target", "LESNet-A", "LESNet-B"]: steps.append(("zero_below", 0.05))
+    if varname in ["UGRD_850mb", "VGRD_850mb", "UGRD_925mb", "VGRD_925mb", "flow"]: steps.append((np.multiply, 1.94384))
+    if varname in ["DPT_850mb", "TMP_850mb", "DPT_925mb", "TMP_925mb"]: steps.append((np.subtract, 273.15))
+    if varname in ["TMP_surface", "DPT_2m", "TMP_masked"]:
+        steps += [(np.subtract, 273.15), (np.multiply, 9.0), (np.divide, 5.0), (np.add, 32.0)]
+    if varname in ["DIVG_925mb", "RELV_925mb"]: steps.append((np.multiply, 1e5))
+    if varname == "flow": steps.append(("zero_within", 0.01))
+    return steps
+
+
+def compile_render_spec(varname):
+    """Build the colour lookup table for a variable, or None if its norm is not a BoundaryNorm."""
+    mapper, _ = get_cmap(varname)
+    if not isinstance(mapper.norm, mcolors.BoundaryNorm):
+        return None
+
+    # BoundaryNorm colours depend only on the searchsorted bin, so one
+    # representative value per bin (below the first edge, then each left
+    # edge) is enough to sample the full mapping through matplotlib
+    boundaries = np.asarray(mapper.norm.boundaries, dtype=np.float64)
+    samples = np.concatenate([[boundaries[0] - 1.0], boundaries])
+    lut = np.ascontiguousarray(mapper.to_rgba(samples, bytes=True)[:, :3].T)
+    return RenderSpec(preprocess_steps(varname), boundaries, lut)
+
+
+# Built once at import and shared by every render
+RENDER_SPECS = {var: compile_render_spec(var) for var in RENDERED_VARIABLES}
+
+
+def colorize(varname, arr):
+    """Preprocess a north-up grid and map it to colours.
+
+    Returns:
+        (values, rgb) - the preprocessed float32 grid and a [3, H, W] uint8 array
+    """
+    spec = RENDER_SPECS.get(varname)
+    if spec is None:
+        values = np.nan_to_num(preprocess_variables(varname, arr.astype(np.float32)))
+        mapper, _ = get_cmap(varname)
+        if isinstance(mapper.norm, mcolors.Normalize) and mapper.norm.vmin is None and mapper.norm.vmax is None:
+            mapper.norm.vmin = float(np.nanmin(values))
+            mapper.norm.vmax = float(np.nanmax(values))
+        rgb = np.ascontiguousarray(mapper.to_rgba(values, bytes=True)[..., :3].transpose(2, 0, 1))
+        return values, rgb
+
+    # One private float32 copy, converted in place
+    values = arr.astype(np.float32)
+    for op, operand in spec.steps:
+        if op == "zero_below":
+            values[values < operand] = 0
+        elif op == "zero_within":
+            values[(values > -operand) & (values < operand)] = 0
+        else:
+            op(values, operand, out=values)
+    np.nan_to_num(values, copy=False)
+
+    return values, spec.lut[:, np.searchsorted(spec.boundaries, values, side='right')]
+
+
 def nc_to_tensor(nc, input_nc):
     vars = []
     if input_nc == 14:
@@ -120,7 +229,195 @@ def nc_to_tensor(nc, input_nc):
     return A
 
 
-def process_netcdf_to_pngs(in_path, out_dir):
+# Web Mercator warp for a fixed source grid: destination georeferencing plus
+# the flat source pixel index copied into each covered destination pixel
+WarpPlan = namedtuple('WarpPlan', ['transform', 'width', 'height', 'dst_index', 'src_index'])
+
+# One plan per lake grid, keyed by grid bounds and shape
+_warp_plans = {}
+_warp_plans_lock = threading.Lock()
+
+
+def get_warp_plan(lats, lons, height, width):
+    """Return the cached EPSG:4326 -> EPSG:3857 nearest-neighbour plan for a grid.
+
+    The plan is built once by warping a raster of source pixel indices with
+    the same rasterio call the renderer used to make per variable, so
+    applying it gives identical output.
+    """
+    bounds = (float(lons[0]), float(lats[0]), float(lons[-1]), float(lats[-1]))
+    key = bounds + (height, width)
+    with _warp_plans_lock:
+        plan = _warp_plans.get(key)
+        if plan is not None:
+            return plan
+
+        west, south, east, north = bounds
+        src_crs = CRS.from_epsg(4326)
+        dst_crs = CRS.from_epsg(3857)
+        src_transform = from_bounds(west=west, south=south, east=east, north=north, width=width, height=height)
+        transform_3857, width_3857, height_3857 = rasterio.warp.calculate_default_transform(
+            src_crs, dst_crs, width, height,
+            left=west, bottom=south, right=east, top=north
+        )
+
+        # 1-based so that 0 marks destination pixels no source pixel lands on
+        src_ids = np.arange(1, height * width + 1, dtype=np.int32).reshape(height, width)
+        dst_ids = np.zeros((height_3857, width_3857), dtype=np.int32)
+        reproject(
+            source=src_ids,
+            destination=dst_ids,
+            src_transform=src_transform,
+            src_crs=src_crs,
+            dst_transform=transform_3857,
+            dst_crs=dst_crs,
+            resampling=Resampling.nearest
+        )
+
+        dst_ids = dst_ids.ravel()
+        dst_index = np.flatnonzero(dst_ids)
+        plan = WarpPlan(transform_3857, width_3857, height_3857, dst_index, dst_ids[dst_index] - 1)
+        _warp_plans[key] = plan
+        return plan
+
+
+def apply_warp_plan(plan, bands):
+    """Warp [bands, H, W] source data onto the plan's destination grid."""
+    out = np.zeros((bands.shape[0], plan.height * plan.width), dtype=bands.dtype)
+    out[:, plan.dst_index] = bands.reshape(bands.shape[0], -1)[:, plan.src_index]
+    return out.reshape(bands.shape[0], plan.height, plan.width)
+
+
+def geotiff_profile(fmt=GEOTIFF_FORMAT, compress=GEOTIFF_COMPRESS):
+    """Return the rasterio driver and creation options for rendered GeoTIFFs."""
+    if fmt == 'gtiff':
+        return {'driver': 'GTiff'}
+    if fmt == 'cog':
+        # No predictor: the flat colour fields compress better without one
+        return {
+            'driver': 'COG',
+            'blocksize': GEOTIFF_BLOCKSIZE,
+            'compress': compress,
+            # Colours are categorical, so overviews must not blend them
+            'overview_resampling': 'nearest'
+        }
+    raise ValueError(f"Unsupported GeoTIFF format: {fmt}")
+
+
+def write_geotiff(path, bands, crs, transform):
+    """Write a [count, H, W] array as a GeoTIFF using the configured profile."""
+    with rasterio.open(
+        path,
+        'w',
+        height=bands.shape[1],
+        width=bands.shape[2],
+        count=bands.shape[0],
+        dtype=bands.dtype,
+        crs=crs,
+        transform=transform,
+        **geotiff_profile()
+    ) as dst:
+        dst.write(bands)
+
+
+def render_variable(var, arr, lats, lons, out_dir):
+    """Colorize one variable and write its GeoTIFFs and value JSON to out_dir."""
+    # Preprocess values and map them to colours
+    arr, rgb_bands = colorize(var, np.flipud(arr))
+
+    # Calculate transform for the source grid (EPSG:4326 - lat/lon)
+    height, width = arr.shape
+    transform = from_bounds(
+        west=float(lons[0]),
+        south=float(lats[0]),
+        east=float(lons[-1]),
+        north=float(lats[-1]),
+        width=width,
+        height=height
+    )
+    src_crs = CRS.from_epsg(4326)
+
+    # Optionally keep the EPSG:4326 GeoTIFF; the browser only uses the 3857 product
+    if WRITE_4326_TIFF:
+        write_geotiff(os.path.join(out_dir, f"{var}_4326.tif"), rgb_bands, src_crs, transform)
+
+    # Reproject to Web Mercator (EPSG:3857) with the cached nearest-neighbour plan
+    plan = get_warp_plan(lats, lons, height, width)
+    rgb_3857 = apply_warp_plan(plan, rgb_bands)
+    dst_crs = CRS.from_epsg(3857)
+    transform_3857, width_3857, height_3857 = plan.transform, plan.width, plan.height
+
+    write_geotiff(os.path.join(out_dir, f"{var}.tif"), rgb_3857, dst_crs, transform_3857)
+
+    # Save the preprocessed values as a binary grid plus a small JSON header for value readout
+    meta = write_value_grid(var, arr, lats, lons, out_dir)
+
+    # Entry for the folder's metadata index
+    return {
+        "variable": var,
+        "shape": meta["shape"],
+        "dtype": meta["dtype"],
+        "georeferencing": meta["georeferencing"],
+        "min": float(arr.min()),
+        "max": float(arr.max()),
+        "units": VARIABLE_UNITS.get(var, ""),
+        "products": {
+            "geotiff": f"{var}.tif",
+            "header": f"{var}.json",
+            "values": meta["values_url"]
+        }
+    }
+
+
+def encode_value_grid(values, dtype=VALUE_GRID_DTYPE):
+    """Encode a float grid as little-endian bytes.
+
+    Returns:
+        (data, scale, offset) - stored values decode as data * scale + offset
+    """
+    values = np.ascontiguousarray(values, dtype=np.float32)
+    if dtype == 'float32':
+        return values.astype('<f4', copy=False), 1.0, 0.0
+    if dtype == 'int16':
+        # Map [min, max] linearly onto the full int16 range
+        vmin, vmax = float(values.min()), float(values.max())
+        offset = (vmax + vmin) / 2.0
+        scale = (vmax - vmin) / 65534.0 or 1.0
+        data = np.round((values - offset) / scale).astype('<i2')
+        return data, scale, offset
+    raise ValueError(f"Unsupported value grid dtype: {dtype}")
+
+
+def write_value_grid(var, arr, lats, lons, out_dir):
+    """Write <var>.bin (row 0 = southernmost latitude) and its <var>.json header."""
+    data, scale, offset = encode_value_grid(np.flipud(arr))
+    bin_name = f"{var}.bin"
+    data.tofile(os.path.join(out_dir, bin_name))
+
+    meta = {
+        "variable": var,
+        "shape": list(arr.shape),
+        "dtype": data.dtype.name,
+        "byteorder": "little",
+        "scale": scale,
+        "offset": offset,
+        "values_url": bin_name,
+        "georeferencing": {
+            "lat": [float(lats[0]), float(lats[0]), float(lats[-1]), float(lats[-1])],
+            "lon": [float(lons[0]), float(lons[-1]), float(lons[0]), float(lons[-1])]
+        }
+    }
+    with open(os.path.join(out_dir, f"{var}.json"), "w") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def process_netcdf_to_pngs(in_path, out_dir, workers=None):
+    """Render every data variable in in_path, fanning variables out over a pool.
+
+    workers defaults to RENDER_VARIABLE_WORKERS; 1 renders sequentially.
+    Writes the folder's metadata index last and returns it.
+    """
     # Ensure output directory exists
     os.makedirs(out_dir, exist_ok=True)
     ds = xr.open_dataset(in_path)
@@ -129,101 +426,31 @@ def process_netcdf_to_pngs(in_path, out_dir):
     lons = ds.coords['lon'].values if 'lon' in ds.coords else None
 
     if lats is None or lons is None:
+        ds.close()
         raise ValueError("Dataset must have lat/lon coordinates")
 
-    for var in ds.data_vars:
-        # Get original data
-        arr = ds[var].values.astype(np.float32)
-        arr = np.flipud(arr)
-
-        # Preprocess values BEFORE color mapping
-        arr = preprocess_variables(var, arr.copy())
-        arr = np.nan_to_num(arr)
-
-        # Get color mapping
-        mapper, bounds = get_cmap(var)
-        if isinstance(mapper.norm, mcolors.Normalize) and mapper.norm.vmin is None and mapper.norm.vmax is None:
-            mapper.norm.vmin = float(np.nanmin(arr))
-            mapper.norm.vmax = float(np.nanmax(arr))
-
-        # Create colored array
-        rgba_img = mapper.to_rgba(arr, bytes=True)
-        rgb_img = rgba_img[..., :3]  # Drop alpha channel
-
-        # Calculate transform for the GeoTIFF (EPSG:4326 - lat/lon)
-        height, width = arr.shape
-        transform = from_bounds(
-            west=float(lons[0]),
-            south=float(lats[0]),
-            east=float(lons[-1]),
-            north=float(lats[-1]),
-            width=width,
-            height=height
-        )
+    # netCDF reads are not thread-safe, so load everything up front
+    arrays = {var: ds[var].values for var in ds.data_vars}
+    ds.close()
 
-        # Save original GeoTIFF in EPSG:4326
-        tiff_4326_path = os.path.join(out_dir, f"{var}_4326.tif")
-        with rasterio.open(
-            tiff_4326_path,
-            'w',
-            driver='GTiff',
-            height=height,
-            width=width,
-            count=3,
-            dtype=rgb_img.dtype,
-            crs=CRS.from_epsg(4326),
-            transform=transform,
-        ) as dst:
-            for i in range(3):
-                dst.write(rgb_img[:, :, i], i + 1)
-
-        # Reproject to Web Mercator (EPSG:3857)
-        tiff_3857_path = os.path.join(out_dir, f"{var}.tif")
-        with rasterio.open(tiff_4326_path) as src:
-            # Calculate output dimensions
-            dst_crs = CRS.from_epsg(3857)
-            transform_3857, width_3857, height_3857 = rasterio.warp.calculate_default_transform(
-                src.crs, dst_crs, width, height,
-                left=float(lons[0]), bottom=float(lats[0]),
-                right=float(lons[-1]), top=float(lats[-1])
-            )
-
-            out_profile = src.profile.copy()
-            out_profile.update({
-                'crs': dst_crs,
-                'transform': transform_3857,
-                'width': width_3857,
-                'height': height_3857
-            })
-
-            with rasterio.open(tiff_3857_path, 'w', **out_profile) as dst:
-                for i in range(1, 4):
-                    reproject(
-                        source=rasterio.band(src, i),
-                        destination=rasterio.band(dst, i),
-                        src_transform=src.transform,
-                        src_crs=src.crs,
-                        dst_transform=transform_3857,
-                        dst_crs=dst_crs,
-                        resampling=Resampling.nearest
-                    )
-
-        # Save metadata with values and georeferencing for value readout
-        meta = {
-            "variable": var,
-            "shape": arr.shape,
-            "dtype": str(arr.dtype),
-            "georeferencing": {
-                "lat": [float(lats[0]), float(lats[0]), float(lats[-1]), float(lats[-1])],
-                "lon": [float(lons[0]), float(lons[-1]), float(lons[0]), float(lons[-1])]
-            },
-            "values": np.flipud(arr).tolist()  # Save preprocessed values
-        }
-        json_path = os.path.join(out_dir, f"{var}.json")
-        with open(json_path, "w") as f:
-            json.dump(meta, f, indent=2)
+    workers = RENDER_VARIABLE_WORKERS if workers is None else workers
+    if workers <= 1:
+        entries = [render_variable(var, arr, lats, lons, out_dir) for var, arr in arrays.items()]
+    else:
+        if RENDER_VARIABLE_EXECUTOR == 'process':
+            executor = ProcessPoolExecutor(max_workers=min(workers, len(arrays)),
+                                           mp_context=multiprocessing.get_context('spawn'))
+        else:
+            executor = ThreadPoolExecutor(max_workers=min(workers, len(arrays)))
+        with executor:
+            futures = [executor.submit(render_variable, var, arr, lats, lons, out_dir)
+                       for var, arr in arrays.items()]
+            entries = [future.result() for future in futures]  # Re-raise the first rendering error
 
-    ds.close()
+    index = {"variables": {entry["variable"]: entry for entry in entries}}
+    with open(os.path.join(out_dir, METADATA_INDEX_NAME), "w") as f:
+        json.dump(index, f)
+    return index
 
 
 def ds_to_nc(ds1, in_nc_path, out_nc_path, lake):
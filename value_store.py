@@ -0,0 +1,144 @@
+import os
+import json
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Folders whose value grids stay mapped, least recently used unmapped first
+VALUE_STORE_MAX_FOLDERS = 32
+# Largest region, in grid cells, a bbox query may cover
+VALUE_BBOX_MAX_CELLS = 512 * 512
+
+
+class ValueGrid:
+    """One memory-mapped <var>.bin grid plus its <var>.json header.
+
+    Folders rendered before value grids existed keep the values inline in
+    <var>.json; those are loaded into memory instead. Raises
+    FileNotFoundError if the header or its grid does not exist.
+    """
+
+    def __init__(self, header_path):
+        with open(header_path, 'r') as f:
+            self.header = json.load(f)
+        if "shape" not in self.header or "georeferencing" not in self.header:
+            raise FileNotFoundError(f"{header_path} is not a value grid header")
+        self.height, self.width = self.header["shape"]
+        self.scale = self.header.get("scale", 1.0)
+        self.offset = self.header.get("offset", 0.0)
+        georef = self.header["georeferencing"]
+        self.south, self.north = georef["lat"][0], georef["lat"][3]
+        self.west, self.east = georef["lon"][0], georef["lon"][1]
+        values_url = self.header.get("values_url")
+        if values_url is None:
+            if "values" not in self.header:
+                raise FileNotFoundError(f"{header_path} has no values")
+            # Legacy header, also stored with row 0 southernmost
+            self.values = np.asarray(self.header.pop("values"), dtype=np.float32).reshape(self.height, self.width)
+            return
+        dtype = np.dtype(self.header["dtype"]).newbyteorder('<')
+        bin_path = os.path.join(os.path.dirname(header_path), values_url)
+        # Row 0 is the southernmost latitude, as written by util.write_value_grid
+        self.values = np.memmap(bin_path, dtype=dtype, mode='r', shape=(self.height, self.width))
+
+    def decode(self, stored):
+        if self.scale == 1.0 and self.offset == 0.0:
+            return stored.astype(np.float64)
+        return stored * self.scale + self.offset
+
+    def row(self, lat):
+        """Grid row containing lat, or None outside the grid (same rule as the map readout)."""
+        norm = (lat - self.south) / (self.north - self.south)
+        if not 0 <= norm <= 1:
+            return None
+        return min(int(math.floor(norm * self.height)), self.height - 1)
+
+    def col(self, lon):
+        norm = (lon - self.west) / (self.east - self.west)
+        if not 0 <= norm <= 1:
+            return None
+        return min(int(math.floor(norm * self.width)), self.width - 1)
+
+    def point(self, lat, lon):
+        """Return the value at lat/lon, or None outside the grid."""
+        row, col = self.row(lat), self.col(lon)
+        if row is None or col is None:
+            return None
+        return float(self.decode(self.values[row, col]))
+
+    def region(self, south, west, north, east):
+        """Summarize the cells inside a lat/lon box, or None if it misses the grid."""
+        if not all(math.isfinite(bound) for bound in (south, west, north, east)):
+            raise ValueError("Bounding box must be finite numbers")
+        south, north = max(south, self.south), min(north, self.north)
+        west, east = max(west, self.west), min(east, self.east)
+        if south > north or west > east:
+            return None
+
+        row0, row1 = self.row(south), self.row(north)
+        col0, col1 = self.col(west), self.col(east)
+        if (row1 - row0 + 1) * (col1 - col0 + 1) > VALUE_BBOX_MAX_CELLS:
+            raise ValueError("Bounding box covers too many grid cells")
+
+        block = self.decode(self.values[row0:row1 + 1, col0:col1 + 1])
+        valid = block[np.isfinite(block)]
+        return {
+            "rows": [row0, row1],
+            "cols": [col0, col1],
+            "count": int(valid.size),
+            "min": float(valid.min()) if valid.size else None,
+            "max": float(valid.max()) if valid.size else None,
+            "mean": float(valid.mean()) if valid.size else None
+        }
+
+
+class ValueStore:
+    """Point and region lookups against the value grids in data/<folder>/.
+
+    Grids are memory-mapped on first use and kept per folder, so repeated
+    queries are answered from the page cache without re-reading files. A
+    folder is remapped if its directory was replaced by a newer run.
+    """
+
+    def __init__(self, root, max_folders=VALUE_STORE_MAX_FOLDERS):
+        self.root = root
+        self.max_folders = max_folders
+        self._folders = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _generation(self, folder):
+        """Identify the folder on disk, or raise FileNotFoundError."""
+        st = os.stat(os.path.join(self.root, folder))
+        return st.st_ino, st.st_ctime_ns
+
+    def grid(self, folder, var):
+        """Return the ValueGrid for folder/var.
+
+        Raises FileNotFoundError if the folder or variable has no value grid.
+        """
+        generation = self._generation(folder)
+        with self._lock:
+            entry = self._folders.get(folder)
+            if entry is None or entry[0] != generation:
+                entry = (generation, {})
+                self._folders[folder] = entry
+            self._folders.move_to_end(folder)
+            while len(self._folders) > self.max_folders:
+                self._folders.popitem(last=False)
+
+            grids = entry[1]
+            grid = grids.get(var)
+            if grid is None:
+                grid = ValueGrid(os.path.join(self.root, folder, f"{var}.json"))
+                grids[var] = grid
+            return grid
+
+    def stats(self):
+        with self._lock:
+            return {
+                'folders_mapped': len(self._folders),
+                'grids_mapped': sum(len(grids) for _, grids in self._folders.values()),
+                'max_folders': self.max_folders
+            }